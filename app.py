@@ -1,15 +1,49 @@
-from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException, Header
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from PIL import Image
-import io
+from typing import List, Optional
 import os
+import json
+import asyncio
+import hmac
+import time
 import shutil
+import tempfile
+import uuid
+from contextlib import AsyncExitStack
 from datetime import datetime
 
-from database.db import get_db, init_db
+from database.db import get_db, init_db, SessionLocal, check_db
 from database.models import Patient, Prediction
-from utils.inference import get_inference_model
+from utils.inference import (
+    get_inference_model,
+    get_loaded_inference_model,
+    get_batch_scheduler,
+    BATCH_MAX_SIZE
+)
+from utils.model_registry import get_model_registry
+from utils.runtime import get_runtime_settings, WORKERS
+from utils.metrics import (
+    stage,
+    start_trace,
+    add_to_trace,
+    format_trace,
+    render_metrics,
+    REQUEST_LATENCY,
+    record_request_metrics,
+    METRICS_ENABLED
+)
+from utils.concurrency import get_pipeline_executor, PipelineSaturated
+from utils.result_cache import get_result_cache, content_key, RESULT_CACHE_ENABLED
+from utils.tensor_store import get_tensor_store, to_record, TENSOR_STORE_ENABLED
+from utils.ingest import (
+    decode_radiograph,
+    upload_size,
+    spool_to_disk,
+    ImageArchive,
+    UploadTooLarge,
+    MAX_UPLOAD_BYTES
+)
 from utils.gradcam_utils import GradCAMGenerator
 from mlflow_config import mlflow_config
 
@@ -20,10 +54,36 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.middleware("http")
+async def record_request_latency(request, call_next):
+    """Observe end-to-end latency per route for /metrics"""
+    if not METRICS_ENABLED:
+        return await call_next(request)
+    record_request_metrics()
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_LATENCY.observe(getattr(route, "path", "unmatched"), time.perf_counter() - start)
+    return response
+
+
 # Storage directory
 STORAGE_DIR = "storage/patients"
 os.makedirs(STORAGE_DIR, exist_ok=True)
 
+# Grad-CAM modes accepted by /predict:
+#   none  - ages only, no heatmap
+#   lazy  - ages only, heatmap rendered on first GET /gradcam/{prediction_id}/{sex}
+#   eager - heatmaps rendered and saved during /predict
+GRADCAM_MODES = ("none", "lazy", "eager")
+SEXES = ("male", "female")
+
+# X-Admin-Token required by /admin endpoints; they are disabled when unset
+ADMIN_TOKEN = os.environ.get("BONEAGE_ADMIN_TOKEN")
+
+# Background model loads; referenced so they are not garbage collected
+_background_tasks = set()
+
 
 def normalize_path_for_storage(path):
     """
@@ -39,6 +99,34 @@ def normalize_path_for_storage(path):
     return path.replace("\\", "/")
 
 
+def build_gradcam_fields(gradcam_mode, prediction_id, sex, gradcam_path):
+    """
+    Build the Grad-CAM part of a prediction response
+    
+    Args:
+        gradcam_mode: One of GRADCAM_MODES
+        prediction_id: Database ID of the prediction
+        sex: 'male' or 'female'
+        gradcam_path: Saved heatmap path (eager mode only)
+    
+    Returns:
+        dict: gradcam_path and gradcam_url entries
+    """
+    if gradcam_mode == "eager":
+        storage_relative = normalize_path_for_storage(os.path.relpath(gradcam_path, STORAGE_DIR))
+        return {
+            # Use relative paths for portability across different machines
+            "gradcam_path": os.path.relpath(gradcam_path),
+            "gradcam_url": f"/storage/{storage_relative}"
+        }
+    if gradcam_mode == "lazy":
+        return {
+            "gradcam_path": None,
+            "gradcam_url": f"/gradcam/{prediction_id}/{sex}"
+        }
+    return {"gradcam_path": None, "gradcam_url": None}
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and models on startup"""
@@ -46,13 +134,27 @@ async def startup_event():
     print("🚀 Starting Bone Age Estimation API")
     print("=" * 50)
     init_db()
-    # Preload models
-    get_inference_model()
+    # Thread pools must be sized before the first forward
+    runtime_settings = get_runtime_settings()
+    runtime_settings.apply()
+    # Preload models and pay for kernel initialization before serving
+    inference_model = get_inference_model()
+    # Forked serve.py workers inherit the parent's result
+    if runtime_settings.auto_tune and not runtime_settings.tuned:
+        runtime_settings.autotune(inference_model)
+    inference_model.warmup()
     print("=" * 50)
     print("✅ API Ready!")
     print("=" * 50)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker threads and flush pending MLflow runs on shutdown"""
+    get_pipeline_executor().shutdown(wait=True)
+    mlflow_config.shutdown()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -63,174 +165,668 @@ async def root():
     }
 
 
+def decode_upload(upload_file):
+    """
+    Decode an uploaded file into a grayscale PIL Image
+    
+    The multipart body is already spooled to a temporary file by the server,
+    so it is decoded straight from that file (with reduced-resolution
+    decoding where the format allows) instead of being read into memory.
+    """
+    size = upload_size(upload_file)
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"Upload is {size} bytes, limit is {MAX_UPLOAD_BYTES} bytes")
+    
+    # Validate it's an X-ray (grayscale or can be converted)
+    return decode_radiograph(upload_file)
+
+
+def save_original_image(patient_id, pil_image, upload_id):
+    """
+    Save one upload's original image in the patient's directory
+    
+    Returns:
+        tuple: (patient directory, original image path)
+    """
+    patient_dir = os.path.join(STORAGE_DIR, patient_id)
+    os.makedirs(patient_dir, exist_ok=True)
+    
+    original_image_path = os.path.join(patient_dir, f"{upload_id}_original.png")
+    pil_image.save(original_image_path)
+    return patient_dir, original_image_path
+
+
+def upsert_patient(db, patient_id, image_path):
+    """Get or add the patient row and point it at its latest upload (not flushed)"""
+    db_patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
+    if not db_patient:
+        db_patient = Patient(patient_id=patient_id)
+        db.add(db_patient)
+    db_patient.image_path = normalize_path_for_storage(image_path)
+    return db_patient
+
+
+def store_original_image(db, patient_id, pil_image, upload_id, commit=True):
+    """
+    Save the original image patient-wise and make sure the patient exists
+    
+    Each upload gets its own file, so a prediction's input is never
+    overwritten by a later upload for the same patient. The patient's
+    image_path points at the latest upload.
+    
+    Args:
+        upload_id: Unique ID of this upload (names its files)
+        commit: Commit patient changes; otherwise they are only flushed
+                so the patient gets an ID inside the caller's transaction
+    
+    Returns:
+        tuple: (patient database ID, patient directory, original image path)
+    """
+    patient_dir, original_image_path = save_original_image(patient_id, pil_image, upload_id)
+    db_patient = upsert_patient(db, patient_id, original_image_path)
+    if commit:
+        db.commit()
+        db.refresh(db_patient)
+    else:
+        db.flush()
+    
+    return db_patient.id, patient_dir, original_image_path
+
+
+def save_gradcams(inference_model, pil_image, results, patient_dir, upload_id):
+    """
+    Save male and female Grad-CAM overlays
+    
+    Files are named per upload and never rewritten, so result cache entries
+    and queued MLflow runs that point at them stay valid.
+    
+    Args:
+        upload_id: Unique ID of the upload the heatmaps belong to
+    
+    Returns:
+        tuple: (male Grad-CAM path, female Grad-CAM path)
+    """
+    male_gradcam_path = os.path.join(patient_dir, f"{upload_id}_male_gradcam.png")
+    with stage("male_gradcam_save"):
+        inference_model.male_gradcam.save_visualization(
+            pil_image,
+            results['male']['heatmap'],
+            male_gradcam_path
+        )
+    
+    female_gradcam_path = os.path.join(patient_dir, f"{upload_id}_female_gradcam.png")
+    with stage("female_gradcam_save"):
+        inference_model.female_gradcam.save_visualization(
+            pil_image,
+            results['female']['heatmap'],
+            female_gradcam_path
+        )
+    
+    return male_gradcam_path, female_gradcam_path
+
+
+def store_prediction(db, prediction, commit=True):
+    """Insert a prediction row and return its ID (flushed only if commit is False)"""
+    db.add(prediction)
+    if commit:
+        db.commit()
+        db.refresh(prediction)
+    else:
+        db.flush()
+    return prediction.id
+
+
 @app.post("/predict")
 async def predict_bone_age(
     image: UploadFile = File(..., description="X-ray image file"),
     patient_id: str = Form(..., description="Patient ID for tracking"),
+    gradcam: str = Form("eager", description="Grad-CAM mode: none, lazy or eager"),
+    debug: bool = Form(False, description="Include per-stage timings in the response"),
     db: Session = Depends(get_db)
 ):
     """
     Main prediction endpoint following the pipeline:
     1. Image Upload & Validation
     2. Store Image (patient-wise for traceability)
-    3. Start MLflow Run (gender = unknown)
+    3. Collect MLflow Run parameters (gender = unknown)
     4. On-the-fly Augmentation
     5. Preprocessing
     6. Male Model Inference (age, uncertainty, Grad-CAM)
     7. Female Model Inference (age, uncertainty, Grad-CAM)
-    8. MLflow Logging (both predictions)
+    8. MLflow Logging (both predictions, run recorded in one call)
     9. Store Results in Database
     10. Return Dual Prediction
+    
+    Blocking stages (decoding, file writes, model forwards, MLflow and
+    database I/O) run on the bounded pipeline executor so the event loop
+    stays responsive. When the pipeline is saturated the request is
+    rejected with HTTP 503 and a Retry-After header.
+    
+    Grad-CAM generation is controlled by the `gradcam` form field. With
+    `lazy` or `none` no backward pass or heatmap PNG is produced here; the
+    heatmap can be requested later from GET /gradcam/{prediction_id}/{sex}.
+    
+    Every stage is timed into the histograms served by GET /metrics; with
+    `debug=true` the timings of this request are returned as `timings_ms`.
     """
+    if gradcam not in GRADCAM_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"gradcam must be one of: {', '.join(GRADCAM_MODES)}"
+        )
+    
+    trace = start_trace() if debug else None
+    executor = get_pipeline_executor()
+    try:
+        async with executor.admit():
+            return await run_prediction_pipeline(executor, image, patient_id, gradcam, db, trace)
+    except PipelineSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+
+async def run_prediction_pipeline(executor, image, patient_id, gradcam, db, trace=None):
+    """Run the /predict pipeline for one admitted request"""
+    request_timestamp = datetime.now().isoformat()
+    request_start = time.perf_counter()
     
+    # ===== STEP 1: Validation =====
+    if not image.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    # Decode image from the spooled upload
     try:
-        # ===== STEP 1: Validation =====
-        if not image.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
-        
-        # Read image
-        image_bytes = await image.read()
-        pil_image = Image.open(io.BytesIO(image_bytes))
-        
-        # Validate it's an X-ray (grayscale or can be converted)
-        pil_image = pil_image.convert('L')
-        
-        # ===== STEP 2: Store Image =====
-        patient_dir = os.path.join(STORAGE_DIR, patient_id)
-        os.makedirs(patient_dir, exist_ok=True)
-        
-        original_image_path = os.path.join(patient_dir, "original.png")
-        pil_image.save(original_image_path)
-        
-        # Check if patient exists in database
-        db_patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
-        if not db_patient:
-            db_patient = Patient(
-                patient_id=patient_id,
-                image_path=normalize_path_for_storage(original_image_path)
+        with stage("validate_decode"):
+            pil_image = await executor.run(decode_upload, image.file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    # ===== STEP 2: Store Image =====
+    upload_id = uuid.uuid4().hex
+    with stage("store_image"):
+        db_patient_id, patient_dir, original_image_path = await executor.run(
+            store_original_image, db, patient_id, pil_image, upload_id
+        )
+    
+    inference_model = get_inference_model()
+    with_gradcam = gradcam == "eager"
+    
+    # Eager requests run the fp32 Grad-CAM model regardless of the backend
+    model_version = inference_model.served_version(with_gradcam)
+    
+    # ===== Result Cache Lookup (identical pixels + model version) =====
+    cache_key = None
+    outcome = None
+    if RESULT_CACHE_ENABLED:
+        result_cache = get_result_cache()
+        with stage("cache_lookup"):
+            cache_key = await executor.run(content_key, pil_image, model_version)
+            outcome = await executor.run(result_cache.get, cache_key)
+        if outcome is not None and with_gradcam and not cached_heatmaps_exist(outcome):
+            # Heatmaps were never rendered for this entry or have been removed
+            outcome = None
+    
+    cache_hit = outcome is not None
+    run_id = None
+    if cache_hit:
+        if with_gradcam:
+            outcome["male_gradcam_path"], outcome["female_gradcam_path"] = await executor.run(
+                link_cached_gradcams, outcome, patient_dir, upload_id
             )
-            db.add(db_patient)
-            db.commit()
-            db.refresh(db_patient)
-        
-        # ===== STEP 3: Start MLflow Run =====
-        run = mlflow_config.start_run(run_name=f"patient_{patient_id}")
-        run_id = mlflow_config.get_run_id()
-        
-        # Log parameters
-        mlflow_config.log_params({
-            "patient_id": patient_id,
-            "gender": "unknown",  # As per pipeline diagram
-            "image_size": f"{pil_image.size[0]}x{pil_image.size[1]}",
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # ===== STEP 4-6: Male Model Inference =====
-        inference_model = get_inference_model()
-        
-        # Male prediction
-        male_result = inference_model.infer_male(pil_image)
-        male_age = male_result['age']
-        male_uncertainty = male_result['uncertainty']
-        
-        # Generate Male Grad-CAM
-        male_heatmap = inference_model.generate_gradcam(
-            male_result['input_tensor'],
-            male_result['original_image'],
-            model_type='male'
+        else:
+            outcome["male_gradcam_path"] = None
+            outcome["female_gradcam_path"] = None
+    else:
+        outcome, run_id = await run_inference_and_log(
+            executor, inference_model, pil_image, patient_id, patient_dir, upload_id,
+            original_image_path, gradcam, request_timestamp
         )
-        male_gradcam_path = os.path.join(patient_dir, "male_gradcam.png")
-        male_gradcam_path_normalized = normalize_path_for_storage(male_gradcam_path)
-        inference_model.male_gradcam.save_visualization(
-            pil_image,
-            male_heatmap,
-            male_gradcam_path
+        if cache_key is not None:
+            with stage("cache_store"):
+                await executor.run(result_cache.put, cache_key, outcome)
+    
+    male_age = outcome["male_age"]
+    male_uncertainty = outcome["male_uncertainty"]
+    male_gradcam_path = outcome["male_gradcam_path"]
+    female_age = outcome["female_age"]
+    female_uncertainty = outcome["female_uncertainty"]
+    female_gradcam_path = outcome["female_gradcam_path"]
+    
+    # ===== STEP 9: Store Results in Database =====
+    db_prediction = Prediction(
+        patient_id=db_patient_id,
+        male_age=male_age,
+        male_uncertainty=male_uncertainty,
+        male_gradcam_path=normalize_path_for_storage(male_gradcam_path) if male_gradcam_path else None,
+        female_age=female_age,
+        female_uncertainty=female_uncertainty,
+        female_gradcam_path=normalize_path_for_storage(female_gradcam_path) if female_gradcam_path else None,
+        mlflow_run_id=run_id,
+        model_version=model_version,
+        image_path=normalize_path_for_storage(original_image_path)
+    )
+    with stage("db_commit"):
+        prediction_id = await executor.run(store_prediction, db, db_prediction)
+    
+    # Keep the preprocessed input for re-scoring without decoding the PNG again
+    if TENSOR_STORE_ENABLED:
+        with stage("tensor_store"):
+            await executor.run(get_tensor_store().append, pil_image, db_patient_id, prediction_id)
+    
+    # ===== STEP 10: Return Dual Prediction =====
+    response = {
+        "status": "success",
+        "patient_id": patient_id,
+        "prediction_id": prediction_id,
+        "mlflow_run_id": run_id,
+        "gradcam_mode": gradcam,
+        "cache_hit": cache_hit,
+        "male_prediction": {
+            "age": round(male_age, 2),
+            "uncertainty_sigma": round(male_uncertainty, 3),
+            **build_gradcam_fields(gradcam, prediction_id, "male", male_gradcam_path)
+        },
+        "female_prediction": {
+            "age": round(female_age, 2),
+            "uncertainty_sigma": round(female_uncertainty, 3),
+            **build_gradcam_fields(gradcam, prediction_id, "female", female_gradcam_path)
+        },
+        "timestamp": datetime.now().isoformat(),
+        "message": "Male & Female Bone Age Results"
+    }
+    if trace is not None:
+        trace["total"] = time.perf_counter() - request_start
+        response["timings_ms"] = format_trace(trace)
+    
+    return JSONResponse(content=response, status_code=200)
+
+
+def cached_heatmaps_exist(entry):
+    """Check that a cached result's Grad-CAM files are still on disk"""
+    return all(
+        entry[field] and os.path.exists(entry[field])
+        for field in ("male_gradcam_path", "female_gradcam_path")
+    )
+
+
+def link_cached_gradcams(entry, patient_dir, upload_id):
+    """
+    Give a cache hit its own copies of the cached Grad-CAM overlays
+    
+    The cached files usually sit in the directory of the patient whose upload
+    populated the cache. Identical pixels give identical overlays, so they are
+    hard-linked (copied where links are unsupported) into this patient's
+    directory under this upload's names.
+    
+    Returns:
+        tuple: (male Grad-CAM path, female Grad-CAM path)
+    """
+    paths = []
+    for sex in SEXES:
+        source = entry[f"{sex}_gradcam_path"]
+        target = os.path.join(patient_dir, f"{upload_id}_{sex}_gradcam.png")
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+        paths.append(target)
+    return tuple(paths)
+
+
+async def run_inference_and_log(executor, inference_model, pil_image, patient_id, patient_dir, upload_id,
+                                original_image_path, gradcam, request_timestamp):
+    """
+    Run both models (and Grad-CAM in eager mode) and record the MLflow run
+    
+    Returns:
+        tuple: (result dict with ages, uncertainties and Grad-CAM paths, MLflow run ID)
+    """
+    # ===== STEP 3: MLflow Run Parameters =====
+    mlflow_params = {
+        "patient_id": patient_id,
+        "gender": "unknown",  # As per pipeline diagram
+        "image_size": f"{pil_image.size[0]}x{pil_image.size[1]}",
+        "gradcam_mode": gradcam,
+        "timestamp": request_timestamp
+    }
+    
+    # ===== STEP 4-7: Dual Model Inference =====
+    # Preprocess once; the scheduler batches this image with concurrent
+    # uploads. In eager mode each model runs a single grad-enabled forward
+    # that yields both the prediction and its Grad-CAM heatmap
+    with_gradcam = gradcam == "eager"
+    with stage("preprocess"):
+        input_tensor, _ = await executor.run(inference_model.preprocess_image, pil_image)
+    results = await get_batch_scheduler().submit(
+        input_tensor, with_gradcam=with_gradcam, inference_model=inference_model
+    )
+    # Queue wait and model forwards were timed on the batch this request joined
+    add_to_trace(results['stage_timings'])
+    outcome = {
+        "male_age": results['male']['age'],
+        "male_uncertainty": results['male']['uncertainty'],
+        "male_gradcam_path": None,
+        "female_age": results['female']['age'],
+        "female_uncertainty": results['female']['uncertainty'],
+        "female_gradcam_path": None
+    }
+    
+    if with_gradcam:
+        outcome["male_gradcam_path"], outcome["female_gradcam_path"] = await executor.run(
+            save_gradcams, inference_model, pil_image, results, patient_dir, upload_id
         )
-        
-        # ===== STEP 7: Female Model Inference =====
-        female_result = inference_model.infer_female(pil_image)
-        female_age = female_result['age']
-        female_uncertainty = female_result['uncertainty']
-        
-        # Generate Female Grad-CAM
-        female_heatmap = inference_model.generate_gradcam(
-            female_result['input_tensor'],
-            female_result['original_image'],
-            model_type='female'
+    
+    # ===== STEP 8: MLflow Logging (run created here, params/metrics/artifacts queued) =====
+    artifacts = [original_image_path]
+    artifacts += [
+        path for path in (outcome["male_gradcam_path"], outcome["female_gradcam_path"]) if path
+    ]
+    with stage("mlflow_log"):
+        run_id = await executor.run(
+            mlflow_config.log_run,
+            f"patient_{patient_id}",
+            mlflow_params,
+            {
+                "male_age": outcome["male_age"],
+                "male_uncertainty": outcome["male_uncertainty"],
+                "female_age": outcome["female_age"],
+                "female_uncertainty": outcome["female_uncertainty"],
+            },
+            artifacts
         )
-        female_gradcam_path = os.path.join(patient_dir, "female_gradcam.png")
-        female_gradcam_path_normalized = normalize_path_for_storage(female_gradcam_path)
-        inference_model.female_gradcam.save_visualization(
-            pil_image,
-            female_heatmap,
-            female_gradcam_path
+    
+    return outcome, run_id
+
+
+@app.post("/predict/batch")
+async def predict_batch(
+    images: Optional[List[UploadFile]] = File(None, description="X-ray image files"),
+    patient_ids: Optional[List[str]] = Form(None, description="Patient IDs, one per image (default: file name)"),
+    archive: Optional[UploadFile] = File(None, description="Zip or tar archive of X-ray images"),
+    gradcam: str = Form("lazy", description="Grad-CAM mode: none, lazy or eager")
+):
+    """
+    Score many images in one request
+    
+    Images come either as repeated `images` parts or as a single zip/tar
+    `archive`. Patient IDs are taken from `patient_ids` in upload/archive
+    order, or from each file name without its extension.
+    
+    Images are decoded and run through the male and female models in
+    batches of up to BONEAGE_BATCH_MAX_SIZE. All Patient and Prediction rows
+    are written in one transaction that is committed after the last image,
+    and a single MLflow run records the whole batch.
+    
+    The response is streamed as NDJSON: one line per image as soon as its
+    batch finishes (status 'success' or 'error'), then a final 'summary'
+    line reporting whether the transaction was committed. Prediction IDs in
+    the per-image lines are only durable once the summary says committed.
+    """
+    if gradcam not in GRADCAM_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"gradcam must be one of: {', '.join(GRADCAM_MODES)}"
         )
-        
-        # ===== STEP 8: MLflow Logging =====
-        mlflow_config.log_metrics({
-            "male_age": male_age,
-            "male_uncertainty": male_uncertainty,
-            "female_age": female_age,
-            "female_uncertainty": female_uncertainty,
-        })
-        
-        # Log artifacts
-        mlflow_config.log_artifact(original_image_path)
-        mlflow_config.log_artifact(male_gradcam_path)
-        mlflow_config.log_artifact(female_gradcam_path)
-        
-        # End MLflow run
-        mlflow_config.end_run()
-        
-        # ===== STEP 9: Store Results in Database =====
-        db_prediction = Prediction(
-            patient_id=db_patient.id,
-            male_age=male_age,
-            male_uncertainty=male_uncertainty,
-            male_gradcam_path=male_gradcam_path_normalized,
-            female_age=female_age,
-            female_uncertainty=female_uncertainty,
-            female_gradcam_path=female_gradcam_path_normalized,
-            mlflow_run_id=run_id
+    if bool(images) == bool(archive):
+        raise HTTPException(status_code=400, detail="Provide either images or an archive")
+    
+    # The pipeline slot is taken before any work and held until the
+    # streaming response finishes; it is released together with the uploads
+    executor = get_pipeline_executor()
+    resources = AsyncExitStack()
+    try:
+        await resources.enter_async_context(executor.admit())
+    except PipelineSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    # Uploads are closed once this handler returns, so copy them out for the
+    # streaming response; the directory is removed when streaming ends
+    work_dir = tempfile.mkdtemp(prefix="boneage_batch_")
+    resources.callback(shutil.rmtree, work_dir, ignore_errors=True)
+    try:
+        if archive is not None:
+            archive_path = await executor.run(spool_to_disk, archive.file, work_dir)
+            image_archive = await executor.run(ImageArchive, archive_path)
+            resources.callback(image_archive.close)
+            names = image_archive.names
+            openers = [lambda name=name: image_archive.open(name) for name in names]
+        else:
+            for upload in images:
+                if not (upload.content_type or "").startswith('image/'):
+                    raise HTTPException(status_code=400, detail=f"{upload.filename} is not an image")
+            names = [upload.filename for upload in images]
+            paths = [await executor.run(spool_to_disk, upload.file, work_dir) for upload in images]
+            openers = [lambda path=path: open(path, "rb") for path in paths]
+    except ValueError as e:
+        await resources.aclose()
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        await resources.aclose()
+        raise
+    
+    if not names:
+        await resources.aclose()
+        raise HTTPException(status_code=400, detail="No images found")
+    if patient_ids and len(patient_ids) != len(names):
+        await resources.aclose()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Got {len(patient_ids)} patient IDs for {len(names)} images"
         )
-        db.add(db_prediction)
-        db.commit()
-        db.refresh(db_prediction)
-        
-        # ===== STEP 10: Return Dual Prediction =====
-        # Use relative paths for portability across different machines
-        male_gradcam_relative = os.path.relpath(male_gradcam_path)
-        female_gradcam_relative = os.path.relpath(female_gradcam_path)
-        
-        response = {
-            "status": "success",
-            "patient_id": patient_id,
-            "prediction_id": db_prediction.id,
-            "mlflow_run_id": run_id,
-            "male_prediction": {
-                "age": round(male_age, 2),
-                "uncertainty_sigma": round(male_uncertainty, 3),
-                "gradcam_path": male_gradcam_relative,
-                "gradcam_url": f"/storage/{patient_id}/male_gradcam.png"
-            },
-            "female_prediction": {
-                "age": round(female_age, 2),
-                "uncertainty_sigma": round(female_uncertainty, 3),
-                "gradcam_path": female_gradcam_relative,
-                "gradcam_url": f"/storage/{patient_id}/female_gradcam.png"
-            },
-            "timestamp": datetime.now().isoformat(),
-            "message": "Male & Female Bone Age Results"
+    
+    items = [
+        {
+            "index": index,
+            "filename": name,
+            "patient_id": patient_ids[index] if patient_ids else os.path.splitext(os.path.basename(name))[0],
+            "open": opener
         }
-        
-        return JSONResponse(content=response, status_code=200)
+        for index, (name, opener) in enumerate(zip(names, openers))
+    ]
+    
+    return StreamingResponse(
+        stream_batch_predictions(executor, items, gradcam, resources),
+        media_type="application/x-ndjson"
+    )
+
+
+def decode_batch_item(item):
+    """Open and decode one batch image"""
+    fileobj = item["open"]()
+    try:
+        return decode_upload(fileobj)
+    finally:
+        fileobj.close()
+
+
+def write_batch_rows(rows, run_id):
+    """
+    Insert all Patient/Prediction rows of a batch in one short transaction
+    
+    Args:
+        rows: Buffered (patient ID, Prediction, tensor store record or None)
+        run_id: MLflow run ID recorded on every prediction
+    
+    Returns:
+        list: Prediction IDs, in row order
+    """
+    db = SessionLocal()
+    try:
+        for patient_id, db_prediction, record in rows:
+            db_patient = upsert_patient(db, patient_id, db_prediction.image_path)
+            db.flush()
+            db_prediction.patient_id = db_patient.id
+            db_prediction.mlflow_run_id = run_id
+            db.add(db_prediction)
+            db.flush()
+            if record is not None:
+                get_tensor_store().index(db, record, db_patient.id, db_prediction.id)
+        db.commit()
+        return [db_prediction.id for _, db_prediction, _ in rows]
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def stream_batch_predictions(executor, items, gradcam, resources):
+    """
+    Run the /predict/batch pipeline, yielding one NDJSON line per image
     
+    Rows are buffered in memory while images stream back and are written
+    in one transaction after the last forward, so no database write lock
+    is held across model forwards or slow clients. Prediction IDs are
+    therefore only reported in the final summary line. `resources` holds
+    the pipeline slot admitted by the handler and the spooled uploads; it
+    is closed when streaming ends.
+    """
+    request_timestamp = datetime.now().isoformat()
+    inference_model = get_inference_model()
+    with_gradcam = gradcam == "eager"
+    rows = []
+    indices = []
+    failed = 0
+    
+    def line(payload):
+        return json.dumps(payload) + "\n"
+    
+    try:
+        async with resources:
+            for start in range(0, len(items), BATCH_MAX_SIZE):
+                # ===== Decode, store originals and preprocess the chunk =====
+                prepared = []
+                for item in items[start:start + BATCH_MAX_SIZE]:
+                    try:
+                        pil_image = await executor.run(decode_batch_item, item)
+                        upload_id = uuid.uuid4().hex
+                        patient_dir, original_image_path = await executor.run(
+                            save_original_image, item["patient_id"], pil_image, upload_id
+                        )
+                        input_tensor, _ = await executor.run(inference_model.preprocess_image, pil_image)
+                    except Exception as e:
+                        failed += 1
+                        yield line({
+                            "status": "error",
+                            "index": item["index"],
+                            "filename": item["filename"],
+                            "patient_id": item["patient_id"],
+                            "detail": str(e)
+                        })
+                        continue
+                    prepared.append((item, pil_image, patient_dir, upload_id, original_image_path, input_tensor))
+                
+                if not prepared:
+                    continue
+                
+                # ===== One batched forward per model for the whole chunk =====
+                batch_results = await executor.run(
+                    inference_model.infer_batch,
+                    [entry[-1] for entry in prepared],
+                    with_gradcam
+                )
+                
+                for entry, results in zip(prepared, batch_results):
+                    item, pil_image, patient_dir, upload_id, original_image_path, _ = entry
+                    male_gradcam_path = female_gradcam_path = None
+                    if with_gradcam:
+                        male_gradcam_path, female_gradcam_path = await executor.run(
+                            save_gradcams, inference_model, pil_image, results, patient_dir, upload_id
+                        )
+                    
+                    record = None
+                    if TENSOR_STORE_ENABLED:
+                        # The record is appended now; its index row is added with the batch
+                        record = await executor.run(get_tensor_store().append_record, to_record(pil_image))
+                    
+                    rows.append((item["patient_id"], Prediction(
+                        male_age=results['male']['age'],
+                        male_uncertainty=results['male']['uncertainty'],
+                        male_gradcam_path=normalize_path_for_storage(male_gradcam_path) if male_gradcam_path else None,
+                        female_age=results['female']['age'],
+                        female_uncertainty=results['female']['uncertainty'],
+                        female_gradcam_path=normalize_path_for_storage(female_gradcam_path) if female_gradcam_path else None,
+                        model_version=inference_model.served_version(with_gradcam),
+                        image_path=normalize_path_for_storage(original_image_path)
+                    ), record))
+                    indices.append(item["index"])
+                    
+                    # Lazy Grad-CAM URLs need the prediction ID, so they come with the summary
+                    yield line({
+                        "status": "success",
+                        "index": item["index"],
+                        "filename": item["filename"],
+                        "patient_id": item["patient_id"],
+                        "male_prediction": {
+                            "age": round(results['male']['age'], 2),
+                            "uncertainty_sigma": round(results['male']['uncertainty'], 3),
+                            **build_gradcam_fields(gradcam if with_gradcam else "none", None, "male", male_gradcam_path)
+                        },
+                        "female_prediction": {
+                            "age": round(results['female']['age'], 2),
+                            "uncertainty_sigma": round(results['female']['uncertainty'], 3),
+                            **build_gradcam_fields(gradcam if with_gradcam else "none", None, "female", female_gradcam_path)
+                        }
+                    })
+            
+            # ===== One MLflow run for the whole batch =====
+            run_id = None
+            if rows:
+                run_id = await executor.run(
+                    mlflow_config.log_run,
+                    f"batch_{request_timestamp}",
+                    {
+                        "images": len(items),
+                        "gradcam_mode": gradcam,
+                        "batch_size": BATCH_MAX_SIZE,
+                        "timestamp": request_timestamp
+                    },
+                    {
+                        "succeeded": len(rows),
+                        "failed": failed,
+                        "mean_male_age": sum(row[1].male_age for row in rows) / len(rows),
+                        "mean_female_age": sum(row[1].female_age for row in rows) / len(rows)
+                    }
+                )
+            
+            # ===== Single short transaction for all Patient/Prediction rows =====
+            prediction_ids = await executor.run(write_batch_rows, rows, run_id) if rows else []
+            yield line({
+                "status": "summary",
+                "committed": True,
+                "total": len(items),
+                "succeeded": len(rows),
+                "failed": failed,
+                "mlflow_run_id": run_id,
+                "predictions": [
+                    {
+                        "index": index,
+                        "prediction_id": prediction_id,
+                        **({
+                            "male_gradcam_url": f"/gradcam/{prediction_id}/male",
+                            "female_gradcam_url": f"/gradcam/{prediction_id}/female"
+                        } if gradcam == "lazy" else {})
+                    }
+                    for index, prediction_id in zip(indices, prediction_ids)
+                ],
+                "timestamp": datetime.now().isoformat()
+            })
     except Exception as e:
-        # Ensure MLflow run is ended even on error
-        if mlflow_config.get_run_id():
-            mlflow_config.end_run()
-        
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        yield line({
+            "status": "summary",
+            "committed": False,
+            "total": len(items),
+            "succeeded": 0,
+            "failed": len(items),
+            "detail": f"Batch prediction failed: {str(e)}",
+            "timestamp": datetime.now().isoformat()
+        })
+    finally:
+        # No-op once the async with above has closed it
+        await resources.aclose()
 
 
 @app.get("/results/{patient_id}")
@@ -267,23 +863,241 @@ async def get_patient_results(patient_id: str, db: Session = Depends(get_db)):
             "male_uncertainty": round(pred.male_uncertainty, 3),
             "female_age": round(pred.female_age, 2),
             "female_uncertainty": round(pred.female_uncertainty, 3),
-            "mlflow_run_id": pred.mlflow_run_id
+            "mlflow_run_id": pred.mlflow_run_id,
+            "model_version": pred.model_version
         })
     
     return results
 
 
+@app.get("/gradcam/{prediction_id}/{sex}")
+async def get_gradcam(prediction_id: int, sex: str, db: Session = Depends(get_db)):
+    """
+    Return the Grad-CAM overlay for a prediction, rendering it on first request
+    
+    The heatmap is regenerated from the prediction's own input image with
+    the model that produced the prediction, and cached on disk under the
+    patient's storage directory, wherever the input lives; its path is
+    recorded on the prediction so later requests are served directly from
+    the file.
+    
+    Args:
+        prediction_id: Prediction ID
+        sex: 'male' or 'female'
+    
+    Returns:
+        PNG image of the Grad-CAM overlay; 409 if the prediction's model is
+        no longer being served, 410 if its input image was not kept
+    """
+    if sex not in SEXES:
+        raise HTTPException(status_code=404, detail="sex must be 'male' or 'female'")
+    
+    db_prediction = db.query(Prediction).filter(Prediction.id == prediction_id).first()
+    if not db_prediction:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    
+    path_attr = f"{sex}_gradcam_path"
+    cached_path = getattr(db_prediction, path_attr)
+    if cached_path and os.path.exists(cached_path):
+        return FileResponse(cached_path, media_type="image/png")
+    
+    # Predictions made before per-upload originals were kept have no input
+    input_image_path = db_prediction.image_path
+    if not input_image_path or not os.path.exists(input_image_path):
+        raise HTTPException(status_code=410, detail="Input image of this prediction is no longer available")
+    
+    # Grad-CAM runs the eager model; either tag of the same weights matches it
+    inference_model = get_inference_model()
+    if db_prediction.model_version not in (inference_model.model_version, inference_model.gradcam_model_version):
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"Prediction was made by model version {db_prediction.model_version}, "
+                f"now serving {inference_model.model_version}"
+            )
+        )
+    
+    # Always under API storage: offline-scored rows point at the caller's dataset
+    patient_dir = os.path.join(STORAGE_DIR, db_prediction.patient.patient_id)
+    os.makedirs(patient_dir, exist_ok=True)
+    gradcam_path = os.path.join(patient_dir, f"{sex}_gradcam_{prediction_id}.png")
+    executor = get_pipeline_executor()
+    try:
+        async with executor.admit():
+            await executor.run(
+                inference_model.render_gradcam, input_image_path, gradcam_path, model_type=sex
+            )
+    except PipelineSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    setattr(db_prediction, path_attr, normalize_path_for_storage(gradcam_path))
+    await executor.run(db.commit)
+    
+    return FileResponse(gradcam_path, media_type="image/png")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Check the admin token; admin endpoints are closed unless BONEAGE_ADMIN_TOKEN is set"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (BONEAGE_ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+async def list_model_versions():
+    """
+    List registered model versions and the version being served
+    
+    Returns:
+        Serving model version, registry versions and background load state
+    """
+    registry = get_model_registry()
+    return {
+        "serving_model_version": get_inference_model().model_version,
+        "versions": registry.list_versions(),
+        **registry.get_status()
+    }
+
+
+@app.post("/admin/models/{version}/activate", status_code=202, dependencies=[Depends(require_admin)])
+async def activate_model_version(version: str):
+    """
+    Load a registered model version in the background and swap it in
+    
+    The current model keeps serving while the new version is loaded and
+    warmed up. Requests already in flight finish on the model they started
+    with; new requests use the new version once the swap completes. Poll
+    GET /admin/models for progress.
+    
+    Only available with a single worker process: a swap only reaches the
+    worker that handles the request, so with several workers the version
+    is rolled out by writing models/ACTIVE and restarting instead.
+    
+    Args:
+        version: Version directory name in the model registry
+    """
+    registry = get_model_registry()
+    try:
+        registry.version_paths(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    if WORKERS > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Hot-swap is not supported with {WORKERS} workers; write '{version}' to "
+                   f"{os.path.join(registry.root, 'ACTIVE')} and restart the server"
+        )
+    if registry.loading_version is not None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Version '{registry.loading_version}' is already loading"
+        )
+    
+    # Loading runs on its own thread so pipeline workers keep serving
+    loop = asyncio.get_running_loop()
+    task = loop.run_in_executor(None, registry.activate, version)
+    _background_tasks.add(task)
+    # Failures are recorded in the registry status
+    task.add_done_callback(lambda done: (_background_tasks.discard(done), done.exception()))
+    
+    return {
+        "status": "loading",
+        "version": version,
+        "serving_model_version": get_inference_model().model_version
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics
+    
+    Per-stage /predict latency and per-route request latency histograms,
+    plus point-in-time pipeline gauges.
+    """
+    executor = get_pipeline_executor()
+    inference_model = get_loaded_inference_model()
+    gauges = {
+        "boneage_batch_queue_depth": ("Requests waiting to be batched", get_batch_scheduler().queue_depth),
+        "boneage_inflight_requests": ("Requests admitted into the pipeline", executor.inflight),
+        "boneage_max_inflight_requests": ("Admission limit", executor.max_inflight),
+        "boneage_rejected_requests": ("Requests rejected with 503 since start", executor.rejected),
+        "boneage_mlflow_queued_runs": ("Runs waiting for the MLflow writer", mlflow_config.get_stats()["queued"]),
+        "boneage_model_warmed_up": ("1 when the serving model is warmed up", int(bool(inference_model and inference_model.warmed_up)))
+    }
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe for load balancers
+    
+    Returns 200 only when the models are loaded and warmed up, the database
+    answers and the pipeline has free capacity; otherwise 503 with the same
+    body so the failing check is visible.
+    """
+    inference_model = get_loaded_inference_model()
+    executor = get_pipeline_executor()
+    
+    # Off the pipeline pool: a saturated pipeline is reported under
+    # "pipeline" and must not also time out the database check
+    try:
+        await asyncio.wait_for(asyncio.to_thread(check_db), timeout=2.0)
+        database = {"reachable": True}
+    except Exception as e:
+        database = {"reachable": False, "error": str(e) or type(e).__name__}
+    
+    models = {
+        "loaded": inference_model is not None,
+        "warmed_up": bool(inference_model and inference_model.warmed_up),
+        "model_version": inference_model.model_version if inference_model else None,
+        "backend": inference_model.backend if inference_model else None,
+        "load_s": round(inference_model.startup_time, 3) if inference_model else None,
+        "warmup": inference_model.warmup_timings if inference_model else {}
+    }
+    pipeline = {
+        "queue_depth": get_batch_scheduler().queue_depth,
+        "inflight": executor.inflight,
+        "max_inflight": executor.max_inflight,
+        "saturated": executor.inflight >= executor.max_inflight
+    }
+    
+    ready = models["warmed_up"] and database["reachable"] and not pipeline["saturated"]
+    return JSONResponse(
+        content={
+            "ready": ready,
+            "models": models,
+            "pipeline": pipeline,
+            "database": database,
+            "timestamp": datetime.now().isoformat()
+        },
+        status_code=200 if ready else 503
+    )
+
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
     return {
         "status": "healthy",
-        "models": "loaded",
+        "models": "loaded" if get_loaded_inference_model() is not None else "not loaded",
         "database": "connected",
-        "mlflow": "initialized"
+        "mlflow": "initialized",
+        "batching": get_batch_scheduler().get_stats(),
+        "executor": get_pipeline_executor().get_stats(),
+        "runtime": get_runtime_settings().get_stats(),
+        "mlflow_writer": mlflow_config.get_stats(),
+        "result_cache": get_result_cache().get_stats(),
+        "tensor_store": get_tensor_store().get_stats()
     }
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WORKERS > 1:
+        # Each worker process imports the app and sizes its own thread pools
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
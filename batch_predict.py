@@ -1,100 +1,247 @@
 import os
-import requests
+import argparse
 import json
-from datetime import datetime
+import math
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Configuration
 API_URL = "http://localhost:8000"
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
+CHECKPOINT_FILE = "batch_checkpoint.jsonl"
 
-def get_image_files():
-    """Get all image files in the current directory"""
-    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
+# Responses retried with exponential backoff (honouring Retry-After)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def get_image_files(directory='.'):
+    """Get all image files in a directory"""
     files = []
     
-    for file in os.listdir('.'):
-        if os.path.isfile(file):
+    for file in os.listdir(directory):
+        if os.path.isfile(os.path.join(directory, file)):
             ext = os.path.splitext(file)[1].lower()
-            if ext in image_extensions:
+            if ext in IMAGE_EXTENSIONS:
                 # Skip test images
                 if file != 'test_xray.png':
                     files.append(file)
     
     return sorted(files)
 
-def predict_image(image_path, patient_id):
-    """Send prediction request to API"""
+def create_session(max_inflight, retries, backoff):
+    """
+    Create a pooled keep-alive HTTP session
+    
+    Args:
+        max_inflight: Connections kept open (one per concurrent request)
+        retries: Retries on connection errors and RETRY_STATUSES
+        backoff: Backoff factor; waits backoff * 2 ** (attempt - 1) seconds
+    
+    Returns:
+        requests.Session
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,  # /predict is a POST; retry it too
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_inflight, max_retries=retry)
+    
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def load_checkpoint(checkpoint_file):
+    """
+    Load completed images from the checkpoint file
+    
+    Returns:
+        dict: image name -> checkpoint record
+    """
+    completed = {}
+    if not os.path.exists(checkpoint_file):
+        return completed
+    
+    with open(checkpoint_file) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial line from an interrupted run
+                continue
+            completed[record['image']] = record
+    return completed
+
+class CheckpointWriter:
+    """Appends one JSON line per completed image, safe to call from worker threads"""
+    
+    def __init__(self, checkpoint_file):
+        self._file = open(checkpoint_file, 'a')
+        self._lock = threading.Lock()
+    
+    def write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
+def predict_image(session, api_url, image_path, patient_id, gradcam, timeout):
+    """
+    Send prediction request to API
+    
+    Returns:
+        tuple: (result or None, error or None, latency in seconds)
+    """
+    start = time.perf_counter()
     try:
         with open(image_path, 'rb') as f:
-            files = {'image': (image_path, f, 'image/jpeg')}
-            data = {'patient_id': patient_id}
+            files = {'image': (os.path.basename(image_path), f, 'image/jpeg')}
+            data = {'patient_id': patient_id, 'gradcam': gradcam}
             
-            response = requests.post(f"{API_URL}/predict", files=files, data=data, timeout=30)
+            response = session.post(f"{api_url}/predict", files=files, data=data, timeout=timeout)
+        latency = time.perf_counter() - start
         
         if response.status_code == 200:
-            return response.json(), None
+            return response.json(), None, latency
         else:
-            return None, f"Error {response.status_code}: {response.text}"
-            
+            return None, f"Error {response.status_code}: {response.text}", latency
+    
     except Exception as e:
-        return None, str(e)
+        return None, str(e), time.perf_counter() - start
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch bone age predictions against the API")
+    parser.add_argument("--dir", default=".", help="Directory containing the images")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--max-inflight", type=int, default=4,
+                        help="Requests in flight at once (keep at or below the server's BONEAGE_MAX_INFLIGHT)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-attempt timeout in seconds")
+    parser.add_argument("--retries", type=int, default=5, help="Retries on connection errors, 429 and 5xx")
+    parser.add_argument("--backoff", type=float, default=0.5, help="Exponential backoff factor in seconds")
+    parser.add_argument("--gradcam", choices=["none", "lazy", "eager"], default="eager")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE,
+                        help="JSONL file of completed images; reruns skip them")
+    parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    return parser.parse_args()
 
 def main():
     """Batch process all images"""
+    args = parse_args()
+    
     print("=" * 80)
     print("🦴 BONE AGE ESTIMATION - Batch Processor")
     print("=" * 80)
     
     # Get all images
-    images = get_image_files()
+    images = get_image_files(args.dir)
     
     if not images:
         print("\n❌ No image files found!")
         return
     
-    print(f"\n📸 Found {len(images)} image(s) to process:")
-    for i, img in enumerate(images, 1):
-        print(f"   {i}. {img}")
+    completed = load_checkpoint(args.checkpoint)
+    pending = [img for img in images if img not in completed]
     
-    confirm = input("\n🔄 Process all images? (y/n): ").strip().lower()
+    print(f"\n📸 Found {len(images)} image(s), {len(images) - len(pending)} already done (checkpoint: {args.checkpoint})")
+    for i, img in enumerate(pending, 1):
+        print(f"   {i}. {img}")
     
-    if confirm != 'y':
-        print("❌ Cancelled.")
-        return
+    if pending and not args.yes:
+        confirm = input(f"\n🔄 Process {len(pending)} image(s) with {args.max_inflight} in flight? (y/n): ").strip().lower()
+        
+        if confirm != 'y':
+            print("❌ Cancelled.")
+            return
     
-    # Process each image
-    results = []
+    # Results from earlier runs are carried over into this report
+    results = [
+        {'image': r['image'], 'patient_id': r['patient_id'], 'result': r['result']}
+        for r in completed.values() if r['image'] in images
+    ]
     failed = []
+    latencies = []
     
     print("\n" + "=" * 80)
     print("⏳ PROCESSING IMAGES...")
     print("=" * 80)
     
-    for i, image in enumerate(images, 1):
-        print(f"\n[{i}/{len(images)}] Processing: {image}")
-        
-        # Generate patient ID from filename
-        patient_id = f"BATCH_{os.path.splitext(image)[0]}_{datetime.now().strftime('%Y%m%d')}"
-        
-        result, error = predict_image(image, patient_id)
-        
-        if result:
-            print(f"  ✅ Success! Male: {result['male_prediction']['age']} years, Female: {result['female_prediction']['age']} years")
-            results.append({
-                'image': image,
-                'patient_id': patient_id,
-                'result': result
-            })
-        else:
-            print(f"  ❌ Failed: {error}")
-            failed.append({
-                'image': image,
-                'error': error
-            })
+    session = create_session(args.max_inflight, args.retries, args.backoff)
+    checkpoint = CheckpointWriter(args.checkpoint)
+    batch_date = datetime.now().strftime('%Y%m%d')
+    started = time.perf_counter()
+    
+    pool = ThreadPoolExecutor(max_workers=max(1, args.max_inflight))
+    try:
+        futures = {}
+        for image in pending:
+            # Generate patient ID from filename
+            patient_id = f"BATCH_{os.path.splitext(image)[0]}_{batch_date}"
+            future = pool.submit(
+                predict_image, session, args.api_url, os.path.join(args.dir, image),
+                patient_id, args.gradcam, args.timeout
+            )
+            futures[future] = (image, patient_id)
         
-        # Small delay to not overwhelm the server
-        if i < len(images):
-            time.sleep(0.5)
+        for done, future in enumerate(as_completed(futures), 1):
+            image, patient_id = futures[future]
+            result, error, latency = future.result()
+            latencies.append(latency)
+            
+            if result:
+                print(f"[{done}/{len(pending)}] ✅ {image}  Male: {result['male_prediction']['age']} years, "
+                      f"Female: {result['female_prediction']['age']} years  ({latency * 1000:.0f} ms)")
+                record = {
+                    'image': image,
+                    'patient_id': patient_id,
+                    'result': result
+                }
+                results.append(record)
+                checkpoint.write(record)
+            else:
+                print(f"[{done}/{len(pending)}] ❌ {image}  Failed: {error}")
+                failed.append({
+                    'image': image,
+                    'error': error
+                })
+    finally:
+        # On Ctrl+C drop queued images instead of waiting for them
+        pool.shutdown(wait=True, cancel_futures=True)
+        checkpoint.close()
+        session.close()
+    
+    elapsed = time.perf_counter() - started
+    processed = len(latencies) - len(failed)
+    throughput = {
+        'max_inflight': args.max_inflight,
+        'processed_this_run': processed,
+        'skipped_from_checkpoint': len(images) - len(pending),
+        'elapsed_seconds': round(elapsed, 3),
+        'images_per_second': round(processed / elapsed, 3) if elapsed > 0 else None,
+        'latency_p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        'latency_p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None
+    }
     
     # Display summary
     print("\n" + "=" * 80)
@@ -103,6 +250,9 @@ def main():
     
     print(f"\n✅ Successful: {len(results)}/{len(images)}")
     print(f"❌ Failed: {len(failed)}/{len(images)}")
+    if latencies:
+        print(f"⚡ Throughput: {throughput['images_per_second']} images/s  |  "
+              f"p50 {throughput['latency_p50_ms']} ms  |  p95 {throughput['latency_p95_ms']} ms")
     
     if results:
         print("\n" + "-" * 80)
@@ -126,6 +276,7 @@ def main():
         for f in failed:
             print(f"\n❌ {f['image']}")
             print(f"   Error: {f['error']}")
+        print(f"\n🔁 Re-run to retry failed images; completed ones are skipped via {args.checkpoint}")
     
     # Save summary to file
     summary_file = f"batch_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -135,6 +286,7 @@ def main():
             'total': len(images),
             'successful': len(results),
             'failed': len(failed),
+            'throughput': throughput,
             'results': results,
             'failures': failed
         }, f, indent=2)
@@ -148,6 +300,6 @@ if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("\n\n⚠️  Interrupted by user. Exiting...")
+        print("\n\n⚠️  Interrupted by user. Completed images are kept in the checkpoint. Exiting...")
     except Exception as e:
         print(f"\n❌ Unexpected error: {e}")
@@ -0,0 +1,289 @@
+"""
+Benchmark Script
+Measures the inference and API hot paths and compares runs for regressions.
+
+Micro-benchmarks cover eval_transform, ModelInference.infer_male,
+infer_batch, generate_gradcam and overlay_heatmap across batch sizes and
+torch thread counts. The end-to-end benchmark drives POST /predict through
+FastAPI's TestClient inside a temporary working directory, so the SQLite
+database, patient storage and the MLflow file store used during the run are
+throwaway local copies.
+
+Usage:
+    python benchmark.py --output bench_before.json
+    python benchmark.py --output bench_after.json
+    python benchmark.py --compare bench_before.json bench_after.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_MODELS = ("male_boneage_model.pth", "female_boneage_model.pth")
+
+
+def summarize(samples, items=1):
+    """Latency statistics (ms) for a list of per-call durations in seconds"""
+    ordered = np.sort(np.asarray(samples)) * 1000.0
+    return {
+        "iterations": len(samples),
+        "mean_ms": round(float(ordered.mean()), 3),
+        "p50_ms": round(float(np.percentile(ordered, 50)), 3),
+        "p95_ms": round(float(np.percentile(ordered, 95)), 3),
+        "min_ms": round(float(ordered[0]), 3),
+        "items_per_s": round(items * 1000.0 / float(ordered.mean()), 2)
+    }
+
+
+def time_call(func, iterations, warmup, items=1):
+    """Run func warmup + iterations times and summarize the timed calls"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, items)
+
+
+def synthetic_xray(size=512, seed=0):
+    """Deterministic grayscale test image"""
+    from PIL import Image
+    
+    pixels = np.random.RandomState(seed).randint(50, 200, (size, size), dtype=np.uint8)
+    return Image.fromarray(pixels, mode='L')
+
+
+def run_micro(inference_model, batch_sizes, thread_counts, iterations, warmup):
+    """Benchmark the inference building blocks"""
+    import torch
+    from utils.augmentation import eval_transform
+    
+    image = synthetic_xray()
+    results = {}
+    
+    for threads in thread_counts:
+        torch.set_num_threads(threads)
+        print(f"\n🧵 torch threads = {threads}")
+        
+        name = f"eval_transform[threads={threads}]"
+        results[name] = time_call(lambda: eval_transform(image), iterations, warmup)
+        print(f"  {name}: {results[name]['p50_ms']} ms")
+        
+        name = f"infer_male[threads={threads}]"
+        results[name] = time_call(lambda: inference_model.infer_male(image), iterations, warmup)
+        print(f"  {name}: {results[name]['p50_ms']} ms")
+        
+        input_tensor, _ = inference_model.preprocess_image(image)
+        for batch_size in batch_sizes:
+            batch = input_tensor.repeat(batch_size, 1, 1, 1)
+            name = f"infer_batch[bs={batch_size},threads={threads}]"
+            results[name] = time_call(lambda: inference_model.infer_batch(batch), iterations, warmup, batch_size)
+            print(f"  {name}: {results[name]['p50_ms']} ms ({results[name]['items_per_s']} img/s)")
+        
+        name = f"generate_gradcam[threads={threads}]"
+        results[name] = time_call(
+            lambda: inference_model.generate_gradcam(input_tensor, image, 'male'), iterations, warmup
+        )
+        print(f"  {name}: {results[name]['p50_ms']} ms")
+    
+    heatmap = inference_model.generate_gradcam(input_tensor, image, 'male')
+    name = "overlay_heatmap"
+    results[name] = time_call(
+        lambda: inference_model.male_gradcam.overlay_heatmap(image, heatmap), iterations, warmup
+    )
+    print(f"\n  {name}: {results[name]['p50_ms']} ms")
+    return results
+
+
+def run_api(inference_model, iterations, warmup, gradcam_modes, threads):
+    """
+    Benchmark POST /predict end to end through FastAPI's TestClient
+    
+    Runs in a temporary working directory so the database, patient storage
+    and MLflow file store are isolated; the result cache is disabled so
+    every request runs the models. The app's startup hook applies its own
+    thread settings, so the thread count is pinned again once it has run.
+    """
+    import torch
+    
+    workdir = tempfile.mkdtemp(prefix="boneage_bench_")
+    original_cwd = os.getcwd()
+    os.environ["BONEAGE_RESULT_CACHE"] = "0"
+    os.environ["BONEAGE_TENSOR_STORE"] = "0"
+    # A fixed count also keeps startup from auto-tuning
+    os.environ["BONEAGE_TORCH_THREADS"] = str(threads)
+    os.chdir(workdir)
+    try:
+        from fastapi.testclient import TestClient
+        from utils.inference import set_inference_model
+        import app as api
+        
+        # Serve the already loaded models instead of loading them again
+        set_inference_model(inference_model)
+        
+        upload = io.BytesIO()
+        synthetic_xray().save(upload, format="PNG")
+        payload = upload.getvalue()
+        
+        results = {}
+        with TestClient(api.app) as client:
+            torch.set_num_threads(threads)
+            for gradcam in gradcam_modes:
+                counter = iter(range(warmup + iterations))
+                
+                def predict():
+                    response = client.post(
+                        "/predict",
+                        files={"image": ("bench.png", payload, "image/png")},
+                        data={"patient_id": f"BENCH_{next(counter)}", "gradcam": gradcam}
+                    )
+                    response.raise_for_status()
+                
+                name = f"api_predict[gradcam={gradcam},threads={threads}]"
+                results[name] = time_call(predict, iterations, warmup)
+                print(f"  {name}: {results[name]['p50_ms']} ms")
+        return results
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def environment_info():
+    """Host and library versions recorded with each run"""
+    import torch
+    
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare(baseline_path, candidate_path, threshold):
+    """
+    Compare p50 latencies of two runs
+    
+    Returns:
+        int: 1 if any benchmark regressed by more than threshold, else 0
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    with open(candidate_path) as f:
+        candidate = json.load(f)["results"]
+    
+    print("=" * 80)
+    print(f"{'Benchmark':44}{'Base p50':>11}{'New p50':>11}{'Change':>10}")
+    print("=" * 80)
+    regressions = []
+    for name in sorted(set(baseline) & set(candidate)):
+        before = baseline[name]["p50_ms"]
+        after = candidate[name]["p50_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  ❌"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  ✅"
+        print(f"{name:44}{before:>11.3f}{after:>11.3f}{change * 100:>9.1f}%{flag}")
+    
+    for name in sorted(set(baseline) ^ set(candidate)):
+        print(f"{name:44}  (only in {'baseline' if name in baseline else 'candidate'})")
+    
+    print("=" * 80)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {threshold * 100:.0f}%: {', '.join(regressions)}")
+        return 1
+    print(f"✅ No regressions beyond {threshold * 100:.0f}%")
+    return 0
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference and API hot paths")
+    parser.add_argument("--models", nargs=2, default=DEFAULT_MODELS, metavar=("MALE", "FEMALE"))
+    parser.add_argument("--batch-sizes", type=parse_list, default=[1, 4, 16])
+    parser.add_argument("--threads", type=parse_list, default=[1, os.cpu_count() or 1],
+                        help="Comma separated torch intra-op thread counts")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--skip-api", action="store_true", help="Only run the micro-benchmarks")
+    parser.add_argument("--gradcam-modes", default="none,eager", help="Grad-CAM modes for the /predict benchmark")
+    parser.add_argument("--output", default=None, help="JSON results path")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="Compare two result files instead of benchmarking")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative p50 slowdown reported as a regression")
+    args = parser.parse_args()
+    
+    if args.compare:
+        return compare(args.compare[0], args.compare[1], args.threshold)
+    
+    import torch
+    from utils.inference import ModelInference
+    
+    torch.manual_seed(0)
+    print("=" * 70)
+    print("⏱️  BONE AGE BENCHMARK")
+    print("=" * 70)
+    
+    male_model_path, female_model_path = (os.path.abspath(path) for path in args.models)
+    inference_model = ModelInference(male_model_path, female_model_path)
+    
+    results = run_micro(inference_model, args.batch_sizes, args.threads, args.iterations, args.warmup)
+    if not args.skip_api:
+        print("\n🌐 End-to-end /predict")
+        results.update(run_api(
+            inference_model, args.iterations, args.warmup,
+            [mode for mode in args.gradcam_modes.split(",") if mode],
+            max(args.threads)
+        ))
+    
+    report = {
+        "environment": environment_info(),
+        "config": {
+            "batch_sizes": args.batch_sizes,
+            "threads": args.threads,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "model_version": inference_model.model_version
+        },
+        "results": results
+    }
+    
+    output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("\n" + "=" * 70)
+    print(f"💾 Results saved to: {output}")
+    print("=" * 70)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
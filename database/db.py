@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -31,8 +31,41 @@ def get_db():
         db.close()
 
 
+def check_db():
+    """Run a trivial query to confirm the database is reachable"""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
 def init_db():
     """Initialize database tables"""
-    from database.models import Patient, Prediction
+    from database.models import Patient, Prediction, CachedResult, StoredTensor
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
     print("✓ Database initialized successfully")
+
+
+def add_missing_columns():
+    """
+    Add nullable columns introduced after a table was created
+    
+    create_all only creates missing tables, so existing databases are
+    brought up to date with ALTER TABLE ADD COLUMN (and their indexes).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                if column.index:
+                    conn.execute(text(
+                        f"CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} "
+                        f"ON {table.name} ({column.name})"
+                    ))
+                print(f"✓ Added column {table.name}.{column.name}")
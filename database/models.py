@@ -40,6 +40,12 @@ class Prediction(Base):
     # MLflow tracking
     mlflow_run_id = Column(String, nullable=True)
     
+    # Fingerprint of the checkpoints/backend that produced the prediction
+    model_version = Column(String, nullable=True, index=True)
+    
+    # Original image this prediction was made from (kept per upload)
+    image_path = Column(String, nullable=True)
+    
     # Metadata
     prediction_timestamp = Column(DateTime, default=datetime.utcnow)
     
@@ -48,3 +54,48 @@ class Prediction(Base):
     
     def __repr__(self):
         return f"<Prediction(male_age={self.male_age}, female_age={self.female_age})>"
+
+
+class CachedResult(Base):
+    """Content-addressed cache of prediction results for repeated uploads"""
+    __tablename__ = "result_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # SHA-256 of decoded pixel data + model version
+    cache_key = Column(String, unique=True, index=True, nullable=False)
+    
+    # Male model predictions
+    male_age = Column(Float, nullable=False)
+    male_uncertainty = Column(Float, nullable=False)
+    male_gradcam_path = Column(String, nullable=True)
+    
+    # Female model predictions
+    female_age = Column(Float, nullable=False)
+    female_uncertainty = Column(Float, nullable=False)
+    female_gradcam_path = Column(String, nullable=True)
+    
+    # Eviction bookkeeping
+    created_timestamp = Column(DateTime, default=datetime.utcnow)
+    last_hit_timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    hit_count = Column(Integer, default=0)
+    
+    def __repr__(self):
+        return f"<CachedResult(cache_key='{self.cache_key[:12]}', hits={self.hit_count})>"
+
+
+class StoredTensor(Base):
+    """Index of preprocessed 224x224 inputs in the append-only tensor store"""
+    __tablename__ = "tensor_store"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False, index=True)
+    prediction_id = Column(Integer, ForeignKey("predictions.id"), nullable=True, index=True)
+    
+    # Record number in the store file (byte offset = record * 224 * 224)
+    record = Column(Integer, nullable=False)
+    
+    created_timestamp = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<StoredTensor(patient_id={self.patient_id}, record={self.record})>"
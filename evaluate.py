@@ -0,0 +1,130 @@
+"""
+Model Evaluation Script
+Evaluates a bone age checkpoint on a held-out CSV (same schema as
+BoneAgeEvalDataset: id, age_group, boneage).
+
+Preprocessed images are cached once in a memory-mapped .npy file (keyed by
+the CSV and image mtimes), so repeated runs skip PNG decoding and resizing.
+Reports age-group accuracy, MAE of the predicted age, the confusion matrix
+and throughput in images/second.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from utils.inference import load_checkpoint, extract_state_dict, build_model
+# utils.inference puts male_boneage/male_boneage on sys.path
+from dataset_eval import CachedBoneAgeEvalDataset, BoneAgeEvalDataset
+
+# Same age group ranges (years) ModelInference reports ages from
+AGE_GROUPS = {
+    0: (0, 5),
+    1: (5, 10),
+    2: (10, 15),
+    3: (15, 20)
+}
+GROUP_MIDPOINTS = np.array([(low + high) / 2 for low, high in AGE_GROUPS.values()])
+
+
+def iter_uncached(dataset, batch_size, num_workers):
+    """Batches straight from BoneAgeEvalDataset (decode + resize every run)"""
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    for images, age_groups, boneages in loader:
+        yield images, np.asarray(age_groups), np.asarray(boneages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a bone age model with cached preprocessed tensors")
+    parser.add_argument("--csv", required=True, help="Held-out CSV (id, age_group, boneage)")
+    parser.add_argument("--img-dir", required=True, help="Directory containing <id>.png images")
+    parser.add_argument("--model", default="male_boneage_model.pth", help="Checkpoint to evaluate")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4, help="Decode workers used when building the cache")
+    parser.add_argument("--cache-dir", default=".eval_cache", help="Where preprocessed tensors are cached")
+    parser.add_argument("--no-cache", action="store_true", help="Decode images every run (for comparison)")
+    parser.add_argument("--boneage-units", choices=["months", "years"], default="months",
+                        help="Units of the CSV boneage column (RSNA uses months)")
+    parser.add_argument("--output", default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("📊 BONE AGE MODEL EVALUATION")
+    print("=" * 70)
+    
+    device = torch.device(args.device if torch.cuda.is_available() else "cpu")
+    model = build_model(extract_state_dict(load_checkpoint(args.model, device)))
+    model.to(device)
+    model.eval()
+    
+    start = time.perf_counter()
+    if args.no_cache:
+        dataset = BoneAgeEvalDataset(args.csv, args.img_dir)
+        batches = iter_uncached(dataset, args.batch_size, args.workers)
+        print(f"\n📸 Images: {len(dataset)}  |  cache disabled")
+    else:
+        dataset = CachedBoneAgeEvalDataset(args.csv, args.img_dir, args.cache_dir, args.workers)
+        batches = dataset.iter_batches(args.batch_size)
+        status = "hit" if dataset.cache_hit else f"built in {time.perf_counter() - start:.1f}s"
+        print(f"\n📸 Images: {len(dataset)}  |  cache {status}: {dataset.cache_path}")
+    
+    predictions = []
+    labels = []
+    boneages = []
+    start = time.perf_counter()
+    with torch.no_grad():
+        for images, age_groups, batch_boneages in batches:
+            grp_output, _ = model(images.to(device))
+            predictions.append(grp_output.argmax(dim=1).cpu().numpy())
+            labels.append(np.asarray(age_groups))
+            boneages.append(np.asarray(batch_boneages, dtype=np.float64))
+    elapsed = time.perf_counter() - start
+    
+    predictions = np.concatenate(predictions)
+    labels = np.concatenate(labels).astype(np.int64)
+    boneages = np.concatenate(boneages)
+    if args.boneage_units == "months":
+        boneages = boneages / 12.0
+    
+    num_groups = len(AGE_GROUPS)
+    confusion = np.bincount(labels * num_groups + predictions, minlength=num_groups * num_groups)
+    confusion = confusion.reshape(num_groups, num_groups)
+    
+    report = {
+        "model": args.model,
+        "images": int(len(predictions)),
+        "cached": not args.no_cache,
+        "accuracy": round(float((predictions == labels).mean()), 4),
+        "mae_years": round(float(np.abs(GROUP_MIDPOINTS[predictions] - boneages).mean()), 3),
+        "confusion_matrix": confusion.tolist(),
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(len(predictions) / elapsed, 2) if elapsed > 0 else None
+    }
+    
+    print("\n" + "-" * 70)
+    print(f"🎯 Accuracy: {report['accuracy'] * 100:.2f}%")
+    print(f"📏 MAE: {report['mae_years']:.3f} years (group midpoint vs boneage)")
+    print(f"⚡ Throughput: {report['images_per_second']} images/s")
+    print("\nConfusion matrix (rows = true group, columns = predicted):")
+    print("      " + "".join(f"{group:>8}" for group in range(num_groups)))
+    for group, row in enumerate(confusion):
+        print(f"{group:>6}" + "".join(f"{count:>8}" for count in row))
+    print("-" * 70)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to: {args.output}")
+    
+    print("=" * 70)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
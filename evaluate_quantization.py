@@ -0,0 +1,129 @@
+"""
+Quantization Evaluation Script
+Compares dynamic int8 quantized inference against fp32 on a held-out CSV
+(same schema as BoneAgeEvalDataset: id, age_group, boneage).
+
+Reports per-image latency, serialized state-dict size and age-group agreement so we can
+decide whether BONEAGE_QUANTIZE=dynamic is safe to enable. The server keeps
+the fp32 model for Grad-CAM next to the int8 copy, so the report also gives
+the weight footprint per worker of both serving modes: quantization trades
+memory for latency, it does not save memory.
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from utils.inference import load_checkpoint, extract_state_dict, build_model, quantize_dynamic_model
+# utils.inference puts male_boneage/male_boneage on sys.path
+from dataset_eval import BoneAgeEvalDataset
+
+
+def state_dict_size_mb(model):
+    """Serialized state dict size in MB (what torch.save writes, not resident memory)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def run_model(model, loader):
+    """
+    Run a model over the loader
+    
+    One untimed forward on the first batch comes first, so allocator and
+    thread pool start-up costs are not charged to whichever model runs first.
+    
+    Returns:
+        tuple: (predicted groups, true groups, seconds spent in forward passes)
+    """
+    predictions = []
+    labels = []
+    forward_time = 0.0
+    with torch.no_grad():
+        warmup_images, _, _ = next(iter(loader))
+        model(warmup_images)
+        
+        for images, age_groups, _ in loader:
+            start = time.perf_counter()
+            grp_output, _ = model(images)
+            forward_time += time.perf_counter() - start
+            predictions.append(grp_output.argmax(dim=1).numpy())
+            labels.append(np.asarray(age_groups))
+    return np.concatenate(predictions), np.concatenate(labels), forward_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare int8 dynamic quantization against fp32")
+    parser.add_argument("--csv", required=True, help="Held-out CSV (id, age_group, boneage)")
+    parser.add_argument("--img-dir", required=True, help="Directory containing <id>.png images")
+    parser.add_argument("--model", default="male_boneage_model.pth", help="Checkpoint to evaluate")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=None, help="Evaluate only the first N images")
+    parser.add_argument("--output", default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("🔬 QUANTIZATION EVALUATION (fp32 vs dynamic int8)")
+    print("=" * 70)
+    
+    dataset = BoneAgeEvalDataset(args.csv, args.img_dir)
+    if args.limit:
+        dataset = Subset(dataset, range(min(args.limit, len(dataset))))
+    loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=False)
+    
+    fp32_model = build_model(extract_state_dict(load_checkpoint(args.model)))
+    fp32_model.eval()
+    int8_model = quantize_dynamic_model(fp32_model)
+    
+    print(f"\n📸 Images: {len(dataset)}  |  Batch size: {args.batch_size}")
+    
+    report = {"model": args.model, "images": len(dataset), "batch_size": args.batch_size}
+    predictions = {}
+    for name, model in (("fp32", fp32_model), ("int8", int8_model)):
+        preds, labels, forward_time = run_model(model, loader)
+        predictions[name] = preds
+        report[name] = {
+            "state_dict_mb": round(state_dict_size_mb(model), 2),
+            "latency_ms_per_image": round(forward_time / len(dataset) * 1000, 3),
+            "accuracy": round(float((preds == labels).mean()), 4)
+        }
+    
+    # BONEAGE_QUANTIZE=dynamic adds the int8 copy; the fp32 model stays for Grad-CAM
+    report["serving_weights_mb"] = {
+        "fp32": report["fp32"]["state_dict_mb"],
+        "dynamic": round(report["fp32"]["state_dict_mb"] + report["int8"]["state_dict_mb"], 2)
+    }
+    report["agreement"] = round(float((predictions["fp32"] == predictions["int8"]).mean()), 4)
+    report["speedup"] = round(
+        report["fp32"]["latency_ms_per_image"] / max(report["int8"]["latency_ms_per_image"], 1e-9), 2
+    )
+    
+    print("\n" + "-" * 70)
+    print(f"{'':10}{'State dict (MB)':>16}{'Latency (ms/img)':>20}{'Accuracy':>12}")
+    print("-" * 70)
+    for name in ("fp32", "int8"):
+        r = report[name]
+        print(f"{name:10}{r['state_dict_mb']:>16.2f}{r['latency_ms_per_image']:>20.3f}{r['accuracy']:>12.4f}")
+    print("-" * 70)
+    print(f"\n🎯 Age-group agreement (int8 vs fp32): {report['agreement'] * 100:.2f}%")
+    print(f"⚡ Speedup: {report['speedup']}x")
+    print(f"🧠 Weights per worker and model: {report['serving_weights_mb']['fp32']:.1f} MB fp32, "
+          f"{report['serving_weights_mb']['dynamic']:.1f} MB with BONEAGE_QUANTIZE=dynamic (fp32 kept for Grad-CAM)")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to: {args.output}")
+    
+    print("=" * 70)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Model Export Script
+Exports bone age checkpoints to optimized inference artifacts
+(TorchScript and/or ONNX) and checks them against eager PyTorch outputs.
+
+The artifacts are written next to each checkpoint (e.g. male_boneage_model.ts,
+male_boneage_model.onnx) where ModelInference picks them up when started
+with BONEAGE_BACKEND=torchscript or BONEAGE_BACKEND=onnx.
+"""
+
+import argparse
+import os
+import sys
+
+import torch
+
+from utils.inference import load_checkpoint, extract_state_dict, build_model
+from utils.backends import (
+    artifact_path,
+    export_torchscript,
+    export_onnx,
+    check_parity,
+    TorchScriptRunner,
+    OnnxRuntimeRunner,
+    PARITY_ATOL
+)
+
+DEFAULT_MODELS = ["male_boneage_model.pth", "female_boneage_model.pth"]
+EXPORT_BACKENDS = ["torchscript", "onnx"]
+
+
+def export_checkpoint(model_path, backends, atol=PARITY_ATOL):
+    """
+    Export one checkpoint to the requested backends
+    
+    Args:
+        model_path: Path to the .pth checkpoint
+        backends: List of backends to export ('torchscript', 'onnx')
+        atol: Maximum accepted absolute difference from eager outputs
+    
+    Returns:
+        bool: True if every export passed its parity check
+    """
+    print(f"\n📦 {model_path}")
+    model = build_model(extract_state_dict(load_checkpoint(model_path)))
+    model.eval()
+    
+    all_passed = True
+    for backend in backends:
+        path = artifact_path(model_path, backend)
+        try:
+            if backend == "torchscript":
+                export_torchscript(model, path)
+                runner = TorchScriptRunner(path, torch.device('cpu'))
+            else:
+                export_onnx(model, path)
+                runner = OnnxRuntimeRunner(path)
+            
+            passed, diffs = check_parity(model, runner, atol=atol)
+        except Exception as e:
+            print(f"  ❌ {backend}: export failed: {e}")
+            all_passed = False
+            continue
+        
+        status = "✅" if passed else "❌"
+        print(f"  {status} {backend}: {path}")
+        print(f"     Max |Δ| grp={diffs['grp']:.2e}  unc={diffs['unc']:.2e}  (tolerance {atol:.0e})")
+        all_passed = all_passed and passed
+    
+    return all_passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export bone age models for optimized inference")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS,
+                        help="Checkpoint paths to export (missing files are skipped)")
+    parser.add_argument("--backend", choices=EXPORT_BACKENDS + ["all"], default="all",
+                        help="Artifact type to export")
+    parser.add_argument("--atol", type=float, default=PARITY_ATOL,
+                        help="Parity tolerance against eager outputs")
+    args = parser.parse_args()
+    
+    backends = EXPORT_BACKENDS if args.backend == "all" else [args.backend]
+    
+    print("=" * 70)
+    print("🚀 BONE AGE MODEL EXPORT")
+    print("=" * 70)
+    
+    model_paths = [path for path in args.models if os.path.exists(path)]
+    if not model_paths:
+        print("\n❌ No checkpoints found.")
+        return 1
+    
+    results = [export_checkpoint(path, backends, args.atol) for path in model_paths]
+    
+    print("\n" + "=" * 70)
+    if all(results):
+        print("✅ ALL EXPORTS PASSED PARITY CHECKS")
+    else:
+        print("❌ SOME EXPORTS FAILED (the server will fall back to eager)")
+    print("=" * 70)
+    
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -53,9 +53,9 @@ if result:
     print("📁 GENERATED FILES")
     print('=' * 70)
     print(f"📂 Location: storage/patients/{patient_id}/")
-    print(f"   ✅ original.png")
-    print(f"   ✅ male_gradcam.png")
-    print(f"   ✅ female_gradcam.png")
+    print(f"   ✅ <upload_id>_original.png")
+    print(f"   ✅ <upload_id>_male_gradcam.png")
+    print(f"   ✅ <upload_id>_female_gradcam.png")
     
     print(f"\n{'=' * 70}")
     print("💾 DATA STORAGE")
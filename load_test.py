@@ -0,0 +1,428 @@
+"""
+Load Test Script
+Replays upload traffic against a running API server to find its saturation point.
+
+Requests arrive open-loop (Poisson arrivals at --rate requests/s) regardless of
+how fast the server answers, so queueing shows up as latency instead of a lower
+send rate. Latency is measured from each request's scheduled arrival time, which
+includes any wait for a free client worker. A mix of /predict uploads (with
+configurable image sizes) and /results/{patient_id} lookups is sent, and the
+server's /metrics gauges are sampled to chart queue depth over time.
+
+Start the server with BONEAGE_RESULT_CACHE=0 so repeated test images are not
+served from the result cache.
+
+Usage:
+    python load_test.py --rate 5 --duration 60 --concurrency 16
+    python load_test.py --rate 20 --sizes 512:0.6,1024:0.3,2048:0.1 --results-ratio 0.3
+"""
+
+import argparse
+import io
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+from PIL import Image
+
+# Configuration
+API_URL = "http://localhost:8000"
+
+# /metrics gauges sampled over the run
+SAMPLED_GAUGES = {
+    "boneage_batch_queue_depth": "queue_depth",
+    "boneage_inflight_requests": "inflight",
+    "boneage_rejected_requests": "rejected",
+    "boneage_mlflow_queued_runs": "mlflow_queued"
+}
+
+
+def parse_size_mix(value):
+    """
+    Parse an image size mix such as "512:0.6,1024:0.3,2048:0.1"
+    
+    Returns:
+        list: (size, weight) pairs
+    """
+    mix = []
+    for item in value.split(","):
+        size, _, weight = item.partition(":")
+        mix.append((int(size), float(weight or 1)))
+    return mix
+
+
+def create_images(size_mix, variants, seed=0):
+    """
+    Encode synthetic grayscale X-rays as PNG
+    
+    Returns:
+        dict: size -> list of PNG bytes (one per variant)
+    """
+    rng = np.random.RandomState(seed)
+    images = {}
+    for size, _ in size_mix:
+        images[size] = []
+        for _ in range(variants):
+            img = Image.fromarray(rng.randint(50, 200, (size, size), dtype=np.uint8), mode='L')
+            buffer = io.BytesIO()
+            img.save(buffer, format='PNG')
+            images[size].append(buffer.getvalue())
+    return images
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies):
+    """Latency percentiles in milliseconds"""
+    if not latencies:
+        return {}
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1)
+    }
+
+
+class LoadTest:
+    """Open-loop load generator for /predict and /results"""
+    
+    def __init__(self, api_url, images, size_mix, rate, duration, concurrency,
+                 results_ratio=0.0, gradcam="lazy", max_backlog=None,
+                 metrics_interval=1.0, timeout=120, seed=0):
+        """
+        Args:
+            api_url: Server base URL
+            images: size -> list of PNG bytes, from create_images
+            size_mix: (size, weight) pairs
+            rate: Mean arrival rate (requests/s)
+            duration: Seconds of arrivals
+            concurrency: Client workers (maximum requests open at once)
+            results_ratio: Fraction of arrivals that are /results lookups
+            gradcam: Grad-CAM mode sent with /predict
+            max_backlog: Arrivals waiting for a worker before new ones are
+                dropped client-side (default: 10 * concurrency)
+            metrics_interval: Seconds between /metrics samples (0 = off)
+            timeout: Per-request timeout in seconds
+            seed: Arrival and mix random seed
+        """
+        self.api_url = api_url.rstrip("/")
+        self.images = images
+        self.sizes = [size for size, _ in size_mix]
+        self.weights = [weight for _, weight in size_mix]
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.results_ratio = results_ratio
+        self.gradcam = gradcam
+        self.max_backlog = max_backlog or 10 * concurrency
+        self.metrics_interval = metrics_interval
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.records = []
+        self.samples = []
+        self.predicted = []
+        self.backlog = 0
+        self.dropped = 0
+    
+    def _session(self):
+        """One keep-alive session per worker thread"""
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+    
+    def _send(self, endpoint, scheduled, patient_id, size=None, variant=0):
+        """Send one request and record its outcome"""
+        started = time.perf_counter()
+        try:
+            if endpoint == "predict":
+                files = {'image': (f'load_{size}.png', self.images[size][variant], 'image/png')}
+                data = {'patient_id': patient_id, 'gradcam': self.gradcam}
+                response = self._session().post(
+                    f"{self.api_url}/predict", files=files, data=data, timeout=self.timeout
+                )
+            else:
+                response = self._session().get(f"{self.api_url}/results/{patient_id}", timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        
+        finished = time.perf_counter()
+        if endpoint == "predict" and status == 200:
+            with self._lock:
+                self.predicted.append(patient_id)
+        
+        with self._lock:
+            self.backlog -= 1
+            self.records.append({
+                "endpoint": endpoint,
+                "size": size,
+                "status": status,
+                "scheduled_s": scheduled - self.started,
+                "finished_s": finished - self.started,
+                "latency_s": finished - scheduled,
+                "client_wait_s": started - scheduled
+            })
+    
+    def _sample_metrics(self):
+        """Poll /metrics for server-side gauges until the run stops"""
+        session = requests.Session()
+        while not self._stop.is_set():
+            sample = {"t": round(time.perf_counter() - self.started, 2)}
+            try:
+                response = session.get(f"{self.api_url}/metrics", timeout=5)
+                response.raise_for_status()
+                for line in response.text.splitlines():
+                    if line.startswith("#"):
+                        continue
+                    name, _, value = line.partition(" ")
+                    if name in SAMPLED_GAUGES:
+                        sample[SAMPLED_GAUGES[name]] = float(value)
+            except (requests.RequestException, ValueError):
+                sample["error"] = True
+            self.samples.append(sample)
+            self._stop.wait(self.metrics_interval)
+    
+    def run(self):
+        """Generate arrivals for the configured duration and wait for all responses"""
+        pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.started = time.perf_counter()
+        sampler = None
+        if self.metrics_interval > 0:
+            sampler = threading.Thread(target=self._sample_metrics, daemon=True)
+            sampler.start()
+        
+        sequence = 0
+        next_arrival = self.started
+        try:
+            while True:
+                next_arrival += self.rng.expovariate(self.rate)
+                if next_arrival - self.started >= self.duration:
+                    break
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                
+                with self._lock:
+                    if self.backlog >= self.max_backlog:
+                        # Client cannot keep up; count it rather than queue without bound
+                        self.dropped += 1
+                        continue
+                    self.backlog += 1
+                    lookup = bool(self.predicted) and self.rng.random() < self.results_ratio
+                    patient_id = self.rng.choice(self.predicted) if lookup else None
+                
+                if lookup:
+                    pool.submit(self._send, "results", next_arrival, patient_id)
+                else:
+                    sequence += 1
+                    size = self.rng.choices(self.sizes, weights=self.weights)[0]
+                    variant = self.rng.randrange(len(self.images[size]))
+                    pool.submit(self._send, "predict", next_arrival, f"LOAD_{self.run_id}_{sequence:06d}", size, variant)
+        except KeyboardInterrupt:
+            print("\n⚠️  Interrupted; waiting for open requests...")
+        finally:
+            pool.shutdown(wait=True)
+            self.elapsed = time.perf_counter() - self.started
+            self._stop.set()
+            if sampler is not None:
+                sampler.join()
+    
+    def report(self):
+        """Summarize records into throughput, latency, error and timeline sections"""
+        sent = len(self.records)
+        ok = [record for record in self.records if record["status"] == 200]
+        
+        endpoints = {}
+        for endpoint in ("predict", "results"):
+            records = [record for record in self.records if record["endpoint"] == endpoint]
+            if not records:
+                continue
+            succeeded = [record["latency_s"] for record in records if record["status"] == 200]
+            endpoints[endpoint] = {
+                "sent": len(records),
+                "ok": len(succeeded),
+                "error_rate": round(1 - len(succeeded) / len(records), 4),
+                "throughput_rps": round(len(succeeded) / self.elapsed, 2),
+                "latency": latency_summary(succeeded),
+                "status_codes": dict(Counter(str(record["status"]) for record in records))
+            }
+        
+        by_size = {}
+        for size in self.sizes:
+            latencies = [
+                record["latency_s"] for record in ok
+                if record["endpoint"] == "predict" and record["size"] == size
+            ]
+            if latencies:
+                by_size[str(size)] = {"ok": len(latencies), **latency_summary(latencies)}
+        
+        # Per-second buckets by completion time, joined with the /metrics samples
+        buckets = defaultdict(lambda: {"sent": 0, "completed": 0, "errors": 0, "latencies": []})
+        for record in self.records:
+            buckets[int(record["scheduled_s"])]["sent"] += 1
+            bucket = buckets[int(record["finished_s"])]
+            bucket["completed"] += 1
+            if record["status"] == 200:
+                bucket["latencies"].append(record["latency_s"])
+            else:
+                bucket["errors"] += 1
+        samples = defaultdict(list)
+        for sample in self.samples:
+            samples[int(sample["t"])].append(sample)
+        
+        timeline = []
+        for second in range(int(self.elapsed) + 1):
+            bucket = buckets.get(second, {"sent": 0, "completed": 0, "errors": 0, "latencies": []})
+            row = {
+                "t": second,
+                "sent": bucket["sent"],
+                "completed": bucket["completed"],
+                "errors": bucket["errors"],
+                "p50_ms": round(percentile(bucket["latencies"], 50) * 1000, 1) if bucket["latencies"] else None
+            }
+            for sample in samples.get(second, [])[-1:]:
+                row.update({key: sample.get(key) for key in ("queue_depth", "inflight", "rejected")})
+            timeline.append(row)
+        
+        queue_depths = [sample["queue_depth"] for sample in self.samples if "queue_depth" in sample]
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                "api_url": self.api_url,
+                "rate": self.rate,
+                "duration": self.duration,
+                "concurrency": self.concurrency,
+                "results_ratio": self.results_ratio,
+                "size_mix": dict(zip(map(str, self.sizes), self.weights)),
+                "gradcam": self.gradcam
+            },
+            "summary": {
+                "elapsed_s": round(self.elapsed, 2),
+                "offered_rps": round((sent + self.dropped) / self.duration, 2),
+                "achieved_rps": round(len(ok) / self.elapsed, 2),
+                "sent": sent,
+                "ok": len(ok),
+                "error_rate": round(1 - len(ok) / sent, 4) if sent else None,
+                "dropped_client_side": self.dropped,
+                "max_client_wait_ms": round(max((record["client_wait_s"] for record in self.records), default=0) * 1000, 1),
+                "max_queue_depth": max(queue_depths) if queue_depths else None,
+                "mean_queue_depth": round(sum(queue_depths) / len(queue_depths), 2) if queue_depths else None
+            },
+            "endpoints": endpoints,
+            "predict_latency_by_size": by_size,
+            "timeline": timeline
+        }
+
+
+def print_report(report):
+    summary = report["summary"]
+    print("\n" + "=" * 70)
+    print("📊 LOAD TEST REPORT")
+    print("=" * 70)
+    print(f"Offered: {summary['offered_rps']} req/s  |  Achieved: {summary['achieved_rps']} req/s  "
+          f"|  Elapsed: {summary['elapsed_s']}s")
+    print(f"Sent: {summary['sent']}  |  OK: {summary['ok']}  |  Error rate: {summary['error_rate']}  "
+          f"|  Dropped (client backlog): {summary['dropped_client_side']}")
+    print(f"Max client wait: {summary['max_client_wait_ms']} ms  |  Server queue depth: "
+          f"max {summary['max_queue_depth']}, mean {summary['mean_queue_depth']}")
+    
+    print(f"\n{'Endpoint':10}{'sent':>7}{'ok':>7}{'ok/s':>8}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for endpoint, stats in report["endpoints"].items():
+        latency = stats["latency"]
+        print(f"{endpoint:10}{stats['sent']:>7}{stats['ok']:>7}{stats['throughput_rps']:>8}"
+              + "".join(f"{latency.get(key, '-'):>9}" for key in ("p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms")))
+        print(f"{'':10}status codes: {stats['status_codes']}")
+    
+    if report["predict_latency_by_size"]:
+        print("\n/predict latency by image size (ms):")
+        for size, stats in report["predict_latency_by_size"].items():
+            print(f"  {size:>5}px  n={stats['ok']:<6} p50 {stats['p50_ms']:<8} p95 {stats['p95_ms']:<8} p99 {stats['p99_ms']}")
+    
+    print(f"\n{'t(s)':>5}{'sent':>6}{'done':>6}{'err':>5}{'p50 ms':>9}{'queue':>7}{'inflight':>10}")
+    for row in report["timeline"]:
+        queue = row.get("queue_depth")
+        inflight = row.get("inflight")
+        print(f"{row['t']:>5}{row['sent']:>6}{row['completed']:>6}{row['errors']:>5}"
+              f"{row['p50_ms'] if row['p50_ms'] is not None else '-':>9}"
+              f"{int(queue) if queue is not None else '-':>7}{int(inflight) if inflight is not None else '-':>10}")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the bone age API")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--rate", type=float, default=2.0, help="Mean arrivals per second (Poisson)")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of arrivals")
+    parser.add_argument("--concurrency", type=int, default=16, help="Maximum requests open at once")
+    parser.add_argument("--max-backlog", type=int, default=None,
+                        help="Arrivals waiting for a worker before new ones are dropped (default: 10 x concurrency)")
+    parser.add_argument("--sizes", type=parse_size_mix, default=parse_size_mix("512:0.6,1024:0.3,2048:0.1"),
+                        help="Image size mix as size:weight pairs")
+    parser.add_argument("--variants", type=int, default=8, help="Distinct images generated per size")
+    parser.add_argument("--results-ratio", type=float, default=0.2,
+                        help="Fraction of arrivals that fetch /results for an earlier patient")
+    parser.add_argument("--gradcam", default="lazy", choices=["none", "lazy", "eager"])
+    parser.add_argument("--metrics-interval", type=float, default=1.0,
+                        help="Seconds between /metrics samples (0 = off)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON report path")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("🚦 BONE AGE API LOAD TEST")
+    print("=" * 70)
+    
+    try:
+        requests.get(f"{args.api_url}/health", timeout=5).raise_for_status()
+    except requests.RequestException as e:
+        print(f"✗ API not reachable at {args.api_url}: {e}")
+        return 1
+    
+    print(f"📸 Generating {args.variants} image(s) per size: {', '.join(str(size) for size, _ in args.sizes)}")
+    images = create_images(args.sizes, args.variants, args.seed)
+    
+    print(f"🚀 {args.rate} req/s for {args.duration}s, concurrency {args.concurrency}, "
+          f"{args.results_ratio:.0%} /results lookups")
+    load_test = LoadTest(
+        args.api_url, images, args.sizes, args.rate, args.duration, args.concurrency,
+        results_ratio=args.results_ratio, gradcam=args.gradcam, max_backlog=args.max_backlog,
+        metrics_interval=args.metrics_interval, timeout=args.timeout, seed=args.seed
+    )
+    load_test.run()
+    
+    report = load_test.report()
+    print_report(report)
+    
+    output = args.output or f"load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report saved to: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
+import hashlib
+import os
+
+import numpy as np
 import pandas as pd
-from torch.utils.data import Dataset
+import torch
+from torch.utils.data import Dataset, DataLoader
 from PIL import Image
 from torchvision import transforms
 
@@ -9,18 +14,114 @@ eval_tf = transforms.Compose([
     transforms.Normalize([0.5], [0.5])
 ])
 
+# eval_tf up to (not including) ToTensor; its uint8 output is cached losslessly
+resize_tf = eval_tf.transforms[0]
+
 
 class BoneAgeEvalDataset(Dataset):
     def __init__(self, csv_path, img_dir):
         self.df = pd.read_csv(csv_path)
         self.df["id"] = self.df["id"].astype(str)
+        # Plain arrays: per-row df.iloc access dominates __getitem__ otherwise
+        self.ids = self.df["id"].to_numpy()
+        self.age_groups = self.df["age_group"].to_numpy()
+        self.boneages = self.df["boneage"].to_numpy()
         self.img_dir = img_dir
 
     def __len__(self):
-        return len(self.df)
+        return len(self.ids)
 
     def __getitem__(self, idx):
-        row = self.df.iloc[idx]
-        img = Image.open(f"{self.img_dir}/{row.id}.png").convert("L")
+        img = Image.open(f"{self.img_dir}/{self.ids[idx]}.png").convert("L")
         img = eval_tf(img)
-        return img, row.age_group, row.boneage
+        return img, self.age_groups[idx], self.boneages[idx]
+
+
+class _ResizedImages(Dataset):
+    """Decoded and resized uint8 pixels, used to fill the tensor cache"""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        img = Image.open(self.paths[idx]).convert("L")
+        return torch.from_numpy(np.asarray(resize_tf(img), dtype=np.uint8).copy())
+
+
+def tensor_cache_path(csv_path, image_paths, cache_dir):
+    """Cache file name keyed by the CSV and every image's mtime and size"""
+    digest = hashlib.sha256()
+    csv_stat = os.stat(csv_path)
+    digest.update(f"{os.path.abspath(csv_path)}:{csv_stat.st_mtime_ns}:{csv_stat.st_size}".encode())
+    for path in image_paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return os.path.join(cache_dir, f"eval_{digest.hexdigest()[:16]}.npy")
+
+
+def build_tensor_cache(image_paths, cache_path, batch_size=64, num_workers=4):
+    """Decode + resize every image once into a [N, 224, 224] uint8 .npy file"""
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    pixels = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(image_paths), 224, 224))
+
+    loader = DataLoader(_ResizedImages(image_paths), batch_size=batch_size, num_workers=num_workers)
+    start = 0
+    for batch in loader:
+        pixels[start:start + len(batch)] = batch.numpy()
+        start += len(batch)
+
+    pixels.flush()
+    del pixels
+    # Rename last so an interrupted build never leaves a valid-looking cache
+    os.replace(tmp_path, cache_path)
+
+
+class CachedBoneAgeEvalDataset(Dataset):
+    """
+    BoneAgeEvalDataset backed by a memory-mapped cache of resized pixels
+
+    The first run decodes and resizes every image into <cache_dir>/eval_<key>.npy;
+    later runs only map that file. The key changes when the CSV or any image
+    is modified. Pixels are stored as uint8 (what Resize produces before
+    ToTensor), so normalizing on read gives exactly eval_tf's output.
+    """
+
+    def __init__(self, csv_path, img_dir, cache_dir=".eval_cache", num_workers=4):
+        df = pd.read_csv(csv_path)
+        self.ids = df["id"].astype(str).to_numpy()
+        self.age_groups = df["age_group"].to_numpy()
+        self.boneages = df["boneage"].to_numpy()
+
+        paths = [f"{img_dir}/{image_id}.png" for image_id in self.ids]
+        self.cache_path = tensor_cache_path(csv_path, paths, cache_dir)
+        self.cache_hit = os.path.exists(self.cache_path)
+        if not self.cache_hit:
+            build_tensor_cache(paths, self.cache_path, num_workers=num_workers)
+
+        self.pixels = np.load(self.cache_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def normalize(pixels):
+        """uint8 [N, 224, 224] -> normalized float [N, 1, 224, 224], as eval_tf"""
+        return torch.from_numpy(np.ascontiguousarray(pixels)).float().div_(255).sub_(0.5).div_(0.5).unsqueeze(1)
+
+    def __getitem__(self, idx):
+        img = self.normalize(self.pixels[idx:idx + 1])[0]
+        return img, self.age_groups[idx], self.boneages[idx]
+
+    def iter_batches(self, batch_size):
+        """Yield (images, age_groups, boneages) by slicing the memmap, no per-item collate"""
+        for start in range(0, len(self), batch_size):
+            end = start + batch_size
+            yield (
+                self.normalize(self.pixels[start:end]),
+                self.age_groups[start:end],
+                self.boneages[start:end]
+            )
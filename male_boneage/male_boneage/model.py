@@ -15,11 +15,13 @@ class CoordAttention(nn.Module):
 
 
 class BoneAgeModel(nn.Module):
-    def __init__(self):
+    def __init__(self, pretrained=True):
+        # pretrained=False skips the ImageNet download; use it when the
+        # weights are loaded from a checkpoint right after construction
         super().__init__()
 
         # ---- CNN backbone (ResNet18) ----
-        cnn = models.resnet18(pretrained=True)
+        cnn = models.resnet18(pretrained=pretrained)
         cnn.conv1 = nn.Conv2d(1, 64, 7, 2, 3, bias=False)
         self.cnn = nn.Sequential(*list(cnn.children())[:-2])
 
@@ -27,7 +29,7 @@ class BoneAgeModel(nn.Module):
         self.pool = nn.AdaptiveAvgPool2d(1)
 
         # ---- ViT backbone ----
-        self.vit = vit_b_16(pretrained=True)
+        self.vit = vit_b_16(pretrained=pretrained)
         self.vit.heads = nn.Identity()
 
         # ---- Fusion ----
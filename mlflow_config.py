@@ -1,8 +1,29 @@
 import mlflow
 import mlflow.pytorch
+from mlflow.tracking import MlflowClient
+from mlflow.entities import Metric, Param
 import os
+import queue
+import threading
+import time
+import uuid
 from datetime import datetime
 
+# Set to 0 to skip per-request MLflow runs entirely
+MLFLOW_PER_REQUEST = os.environ.get("BONEAGE_MLFLOW_PER_REQUEST", "1") != "0"
+
+# Runs buffered for the background writer before falling back to inline logging
+MLFLOW_QUEUE_SIZE = int(os.environ.get("BONEAGE_MLFLOW_QUEUE_SIZE", "256"))
+
+# Maximum runs the writer drains from the queue per wake-up
+MLFLOW_WRITE_BATCH = int(os.environ.get("BONEAGE_MLFLOW_WRITE_BATCH", "32"))
+
+# Run tag holding the key log_run returns (and predictions store as mlflow_run_id)
+RUN_KEY_TAG = "boneage.run_key"
+
+# Sentinel telling the writer thread to exit
+_STOP = object()
+
 
 class MLflowConfig:
     """MLflow configuration and logging utilities"""
@@ -21,6 +42,18 @@ class MLflowConfig:
             self.experiment_id = mlflow.get_experiment_by_name(experiment_name).experiment_id
         
         mlflow.set_experiment(experiment_name)
+        
+        # Background writer for per-request runs (started on first use)
+        self.client = MlflowClient()
+        self.per_request_runs = MLFLOW_PER_REQUEST
+        self._queue = queue.Queue(maxsize=MLFLOW_QUEUE_SIZE)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        
+        # Writer metrics
+        self.runs_written = 0
+        self.runs_overflowed = 0
+        self.runs_failed = 0
         print(f"✓ MLflow initialized: {experiment_name}")
     
     def start_run(self, run_name=None):
@@ -48,6 +81,134 @@ class MLflowConfig:
         else:
             mlflow.log_artifact(image_path)
     
+    def log_run(self, run_name, params: dict, metrics: dict, artifacts=()):
+        """
+        Record a complete run (params, metrics, artifacts) without blocking
+        
+        Nothing touches the tracking store on the caller's thread: run
+        creation, params and metrics (via log_batch), artifact copies and run
+        termination are all handed to a background writer thread. Artifact
+        files are logged from their original paths, which are written once
+        per upload and never rewritten. Since the MLflow run ID only exists
+        once the writer creates the run, the returned key is recorded on the
+        run as the RUN_KEY_TAG tag (see find_run). If the writer's buffer is
+        full, the run is written inline without artifacts.
+        
+        Args:
+            run_name: Name of the MLflow run
+            params: Parameters to log
+            metrics: Metrics to log
+            artifacts: Paths of artifact files to log
+        
+        Returns:
+            str: Run key, or None when per-request runs are disabled
+        """
+        if not self.per_request_runs:
+            return None
+        
+        self._ensure_writer()
+        run_key = uuid.uuid4().hex
+        try:
+            self._queue.put_nowait((run_key, run_name, params, metrics, tuple(artifacts)))
+        except queue.Full:
+            # Survive bursts: keep params/metrics, drop artifact copies
+            self.runs_overflowed += 1
+            self._write_run(run_key, run_name, params, metrics, ())
+        
+        return run_key
+    
+    def find_run(self, run_key):
+        """
+        MLflow run recorded for a key returned by log_run
+        
+        Returns:
+            mlflow.entities.Run or None (also while the run is still queued)
+        """
+        runs = self.client.search_runs(
+            [self.experiment_id], filter_string=f"tags.`{RUN_KEY_TAG}` = '{run_key}'", max_results=1
+        )
+        return runs[0] if runs else None
+    
+    def _ensure_writer(self):
+        """Start the background writer thread on first use"""
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._writer_loop,
+                    name="mlflow-writer",
+                    daemon=True
+                )
+                self._writer.start()
+    
+    def _writer_loop(self):
+        """Drain queued runs in batches and write them to the tracking store"""
+        while True:
+            records = [self._queue.get()]
+            while len(records) < MLFLOW_WRITE_BATCH:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = False
+            for record in records:
+                if record is _STOP:
+                    stop = True
+                else:
+                    self._write_run(*record)
+                self._queue.task_done()
+            
+            if stop:
+                return
+    
+    def _write_run(self, run_key, run_name, params, metrics, artifacts):
+        """Create one run, write its data and mark it finished"""
+        run_id = None
+        try:
+            run = self.client.create_run(self.experiment_id, run_name=run_name, tags={RUN_KEY_TAG: run_key})
+            run_id = run.info.run_id
+            timestamp = int(time.time() * 1000)
+            self.client.log_batch(
+                run_id,
+                metrics=[Metric(key, float(value), timestamp, 0) for key, value in metrics.items()],
+                params=[Param(key, str(value)) for key, value in params.items()]
+            )
+            for artifact_path in artifacts:
+                self.client.log_artifact(run_id, artifact_path)
+            self.client.set_terminated(run_id, "FINISHED")
+            self.runs_written += 1
+        except Exception as e:
+            self.runs_failed += 1
+            print(f"⚠ MLflow logging failed for run {run_name} ({run_key}): {e}")
+            if run_id is None:
+                return
+            try:
+                self.client.set_terminated(run_id, "FAILED")
+            except Exception:
+                pass
+    
+    def flush(self):
+        """Block until all queued runs have been written"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+    
+    def shutdown(self, timeout=30.0):
+        """Flush queued runs and stop the background writer"""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+    
+    def get_stats(self):
+        """Get background writer metrics"""
+        return {
+            "per_request_runs": self.per_request_runs,
+            "queued": self._queue.qsize(),
+            "written": self.runs_written,
+            "overflowed": self.runs_overflowed,
+            "failed": self.runs_failed
+        }
+    
     def end_run(self):
         """End current MLflow run"""
         mlflow.end_run()
@@ -52,9 +52,9 @@ try:
         print("=" * 60)
         print(f"  💾 Database: boneage_predictions.db")
         print(f"  📂 Images: storage/patients/{result['patient_id']}/")
-        print(f"     • original.png")
-        print(f"     • male_gradcam.png")
-        print(f"     • female_gradcam.png")
+        print(f"     • <upload_id>_original.png")
+        print(f"     • <upload_id>_male_gradcam.png")
+        print(f"     • <upload_id>_female_gradcam.png")
         print(f"  📊 MLflow: mlruns/ (view at http://localhost:5000)")
         
         print("\n" + "=" * 60)
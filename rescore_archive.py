@@ -0,0 +1,217 @@
+"""
+Archive Re-scoring Script
+Re-scores every stored patient with the current model checkpoints after a
+model update, inserting new Prediction rows tagged with the model version.
+
+Inputs come from the tensor store when the patient has a record there, and
+otherwise from the patient's latest upload (Patient.image_path, i.e.
+storage/patients/<id>/<upload id>_original.png), decoded in parallel. By
+default the registry's active checkpoints are scored and rows are tagged
+with the same model version the API records, so patients already scored
+by live traffic are skipped and GET /gradcam works for the new rows.
+Progress is checkpointed after every committed batch so an interrupted run
+resumes where it stopped, and a throttle keeps it from starving live
+traffic when run next to the API server.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from database.db import SessionLocal, init_db
+from database.models import Patient, Prediction
+from utils.inference import ModelInference
+from utils.model_registry import get_model_registry
+from utils.ingest import decode_radiograph, MODEL_INPUT_MAX_SIDE
+from utils.tensor_store import get_tensor_store
+
+CHECKPOINT_FILE = "rescore_checkpoint.json"
+
+
+def load_checkpoint(path, model_version):
+    """Last patient database ID completed for this model version (0 if none)"""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("model_version") != model_version:
+        # Checkpoint belongs to another model; start over
+        return 0
+    return state.get("last_patient_id", 0)
+
+
+def save_checkpoint(path, model_version, last_patient_id, done):
+    """Write the checkpoint atomically"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "model_version": model_version,
+            "last_patient_id": last_patient_id,
+            "done": done
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def load_inputs(inference_model, tensor_store, records, patients, pool):
+    """
+    Build the input batch for a page of patients
+    
+    Returns:
+        tuple: (input tensor [N, 1, 224, 224], patients included, {patient_id: error})
+    """
+    stored = [patient for patient in patients if patient.id in records]
+    to_decode = [patient for patient in patients if patient.id not in records]
+    
+    tensors = {}
+    if stored:
+        batch = tensor_store.load_batch([records[patient.id] for patient in stored])
+        tensors.update({patient.id: batch[i:i + 1] for i, patient in enumerate(stored)})
+    
+    def decode(patient):
+        image = decode_radiograph(patient.image_path, max_side=MODEL_INPUT_MAX_SIDE)
+        return inference_model.preprocess_image(image)[0].cpu()
+    
+    errors = {}
+    futures = {patient.id: pool.submit(decode, patient) for patient in to_decode}
+    for patient_id, future in futures.items():
+        try:
+            tensors[patient_id] = future.result()
+        except Exception as e:
+            errors[patient_id] = str(e)
+    
+    included = [patient for patient in patients if patient.id in tensors]
+    if not included:
+        return None, included, errors
+    return torch.cat([tensors[patient.id] for patient in included]), included, errors
+
+
+def format_duration(seconds):
+    """h:mm:ss"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score all stored patients with the current model")
+    parser.add_argument("--male-model", default=None,
+                        help="Male checkpoint (default: the registry's active version, as served by the API)")
+    parser.add_argument("--female-model", default=None,
+                        help="Female checkpoint (default: the registry's active version)")
+    parser.add_argument("--model-version", default=None,
+                        help="Version tag for the new rows (default: the version the API would record)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4, help="Threads decoding images without a stored tensor")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--max-rate", type=float, default=0,
+                        help="Throttle to at most this many images/s (0 = unthrottled)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="Limit intra-op threads to leave CPU for the API server")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after N patients")
+    args = parser.parse_args()
+    
+    if args.torch_threads:
+        torch.set_num_threads(args.torch_threads)
+    
+    print("=" * 70)
+    print("🔁 BONE AGE ARCHIVE RE-SCORING")
+    print("=" * 70)
+    
+    init_db()
+    # Same checkpoints and version tag as the API, so rows match live traffic
+    version, male_model_path, female_model_path = get_model_registry().active_paths()
+    if args.male_model:
+        version, male_model_path, female_model_path = None, args.male_model, args.female_model
+    inference_model = ModelInference(male_model_path, female_model_path, device=args.device, version=version)
+    model_version = args.model_version or inference_model.served_version()
+    tensor_store = get_tensor_store()
+    
+    db = SessionLocal()
+    last_patient_id = load_checkpoint(args.checkpoint, model_version)
+    
+    # Patients already scored by this version (e.g. by live /predict traffic) are skipped
+    already_scored = (
+        db.query(Prediction.patient_id)
+        .filter(Prediction.model_version == model_version)
+    )
+    remaining = (
+        db.query(Patient)
+        .filter(Patient.id > last_patient_id)
+        .filter(~Patient.id.in_(already_scored))
+        .order_by(Patient.id.asc())
+    )
+    total = remaining.count()
+    if args.limit:
+        total = min(total, args.limit)
+    
+    print(f"\n🏷️  Model version: {model_version}")
+    print(f"📋 Patients to re-score: {total} (resuming after patient #{last_patient_id})")
+    
+    done = 0
+    failed = 0
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=max(1, args.workers))
+    
+    try:
+        while done + failed < total:
+            page_size = min(args.batch_size, total - done - failed)
+            patients = remaining.filter(Patient.id > last_patient_id).limit(page_size).all()
+            if not patients:
+                break
+            
+            records = tensor_store.latest_records(db, [patient.id for patient in patients])
+            input_batch, included, errors = load_inputs(inference_model, tensor_store, records, patients, pool)
+            for patient_id, error in errors.items():
+                print(f"  ❌ patient #{patient_id}: {error}")
+            failed += len(errors)
+            
+            if included:
+                results = inference_model.infer_batch(input_batch)
+                for patient, result in zip(included, results):
+                    db.add(Prediction(
+                        patient_id=patient.id,
+                        male_age=result['male']['age'],
+                        male_uncertainty=result['male']['uncertainty'],
+                        female_age=result['female']['age'],
+                        female_uncertainty=result['female']['uncertainty'],
+                        model_version=model_version,
+                        image_path=patient.image_path
+                    ))
+                done += len(included)
+            
+            last_patient_id = patients[-1].id
+            db.commit()
+            save_checkpoint(args.checkpoint, model_version, last_patient_id, done)
+            
+            elapsed = time.perf_counter() - started
+            rate = (done + failed) / elapsed if elapsed > 0 else 0
+            eta = (total - done - failed) / rate if rate > 0 else 0
+            print(f"  {done + failed}/{total}  {rate:.1f} images/s  ETA {format_duration(eta)}")
+            
+            if args.max_rate > 0:
+                # Sleep off any lead over the allowed rate
+                ahead = (done + failed) / args.max_rate - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+    except KeyboardInterrupt:
+        db.rollback()
+        print(f"\n⚠️  Interrupted. Progress is saved; rerun to resume after patient #{last_patient_id}.")
+        return 1
+    finally:
+        pool.shutdown(wait=False)
+        db.close()
+    
+    elapsed = time.perf_counter() - started
+    print("\n" + "=" * 70)
+    print(f"✅ Re-scored: {done}  |  ❌ Failed: {failed}  |  ⏱ {format_duration(elapsed)}")
+    print("=" * 70)
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
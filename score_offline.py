@@ -0,0 +1,300 @@
+"""
+Offline Batch Scoring Script
+Scores a directory of radiographs (or a CSV with the BoneAgeEvalDataset
+schema: id, age_group, boneage) with ModelInference directly, without the
+HTTP API, for nightly backfills.
+
+Images are decoded in DataLoader worker processes and run through both
+models in large batches. Results go to the SQLite database and/or a CSV or
+Parquet file. Grad-CAM overlays are rendered only for flagged cases
+(high uncertainty or IDs listed in a file).
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+import uuid
+
+import torch
+from torch.utils.data import Dataset, DataLoader
+
+from utils.inference import ModelInference
+from utils.model_registry import get_model_registry
+from utils.augmentation import eval_transform
+from utils.ingest import decode_radiograph, is_image_filename, MODEL_INPUT_MAX_SIDE
+
+# Kept apart from storage/patients so backfills never touch heatmaps the API saved
+GRADCAM_DIR = "storage/offline_gradcams"
+OUTPUT_FIELDS = [
+    "id", "image_path",
+    "male_age", "male_uncertainty", "male_gradcam_path",
+    "female_age", "female_uncertainty", "female_gradcam_path",
+    "age_group", "boneage", "prediction_id"
+]
+
+
+class ScoringDataset(Dataset):
+    """
+    Radiographs to score, from a directory or a BoneAgeEvalDataset-style CSV
+    
+    Decoding runs in the DataLoader workers; failures are returned as None
+    and reported instead of aborting the run.
+    """
+    
+    def __init__(self, source, img_dir=None):
+        """
+        Args:
+            source: Directory of images, or CSV with an `id` column
+            img_dir: Directory with <id>.png images (CSV input only)
+        """
+        if os.path.isdir(source):
+            names = sorted(name for name in os.listdir(source) if is_image_filename(name))
+            self.ids = [os.path.splitext(name)[0] for name in names]
+            self.paths = [os.path.join(source, name) for name in names]
+            self.age_groups = [None] * len(names)
+            self.boneages = [None] * len(names)
+        else:
+            import pandas as pd
+            
+            df = pd.read_csv(source)
+            img_dir = img_dir or os.path.dirname(source)
+            self.ids = df["id"].astype(str).tolist()
+            self.paths = [os.path.join(img_dir, f"{image_id}.png") for image_id in self.ids]
+            self.age_groups = df["age_group"].tolist() if "age_group" in df else [None] * len(df)
+            self.boneages = df["boneage"].tolist() if "boneage" in df else [None] * len(df)
+    
+    def __len__(self):
+        return len(self.paths)
+    
+    def __getitem__(self, idx):
+        try:
+            image = decode_radiograph(self.paths[idx], max_side=MODEL_INPUT_MAX_SIDE)
+            return eval_transform(image), idx, None
+        except Exception as e:
+            return None, idx, str(e)
+
+
+def collate_scoring(samples):
+    """Stack decoded images and keep decode errors alongside"""
+    decoded = [(tensor, idx) for tensor, idx, _ in samples if tensor is not None]
+    errors = [(idx, error) for tensor, idx, error in samples if tensor is None]
+    batch = torch.stack([tensor for tensor, _ in decoded]) if decoded else None
+    return batch, [idx for _, idx in decoded], errors
+
+
+def load_flagged_ids(path):
+    """Read one ID per line"""
+    if not path:
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def render_flagged_gradcams(inference_model, dataset, indices, gradcam_dir):
+    """
+    Re-run flagged images with Grad-CAM and save male/female overlays
+    
+    Files are named per render (<gradcam_dir>/<id>/<render id>_<sex>_gradcam.png),
+    so rescoring an ID never overwrites a heatmap an earlier prediction points at.
+    
+    Returns:
+        dict: dataset index -> (male Grad-CAM path, female Grad-CAM path)
+    """
+    images = [decode_radiograph(dataset.paths[idx], max_side=MODEL_INPUT_MAX_SIDE) for idx in indices]
+    batch = torch.stack([eval_transform(image) for image in images])
+    results = inference_model.infer_batch(batch, with_gradcam=True)
+    
+    paths = {}
+    for idx, image, result in zip(indices, images, results):
+        patient_dir = os.path.join(gradcam_dir, dataset.ids[idx])
+        os.makedirs(patient_dir, exist_ok=True)
+        render_id = uuid.uuid4().hex
+        male_path = inference_model.male_gradcam.save_visualization(
+            image, result['male']['heatmap'], os.path.join(patient_dir, f"{render_id}_male_gradcam.png")
+        )
+        female_path = inference_model.female_gradcam.save_visualization(
+            image, result['female']['heatmap'], os.path.join(patient_dir, f"{render_id}_female_gradcam.png")
+        )
+        paths[idx] = (male_path, female_path)
+    return paths
+
+
+def write_to_database(db, rows, model_version):
+    """
+    Insert Patient/Prediction rows for one batch in a single transaction
+    
+    Patients are keyed by image ID; predictions point at their source image
+    so GET /gradcam can still render heatmaps for them later.
+    """
+    from database.models import Patient, Prediction
+    
+    predictions = []
+    for row in rows:
+        db_patient = db.query(Patient).filter(Patient.patient_id == row["id"]).first()
+        if not db_patient:
+            db_patient = Patient(patient_id=row["id"], image_path=row["image_path"])
+            db.add(db_patient)
+            db.flush()
+        
+        prediction = Prediction(
+            patient_id=db_patient.id,
+            male_age=row["male_age"],
+            male_uncertainty=row["male_uncertainty"],
+            male_gradcam_path=row["male_gradcam_path"],
+            female_age=row["female_age"],
+            female_uncertainty=row["female_uncertainty"],
+            female_gradcam_path=row["female_gradcam_path"],
+            model_version=model_version,
+            image_path=row["image_path"]
+        )
+        db.add(prediction)
+        predictions.append(prediction)
+    
+    db.commit()
+    for row, prediction in zip(rows, predictions):
+        row["prediction_id"] = prediction.id
+
+
+def write_output(path, rows):
+    """Write results as Parquet (.parquet) or CSV (anything else)"""
+    if path.endswith(".parquet"):
+        import pandas as pd
+        
+        pd.DataFrame(rows, columns=OUTPUT_FIELDS).to_parquet(path, index=False)
+        return
+    
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score radiographs offline without the HTTP API")
+    parser.add_argument("source", help="Directory of images, or CSV (id, age_group, boneage)")
+    parser.add_argument("--img-dir", default=None, help="Directory with <id>.png images for CSV input")
+    parser.add_argument("--male-model", default=None,
+                        help="Male checkpoint (default: the registry's active version, as served by the API)")
+    parser.add_argument("--female-model", default=None,
+                        help="Female checkpoint (default: the registry's active version)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4, help="DataLoader decode worker processes")
+    parser.add_argument("--output", default=None, help="Results file (.csv or .parquet)")
+    parser.add_argument("--db", action="store_true", help="Write Patient/Prediction rows to the SQLite database")
+    parser.add_argument("--gradcam-uncertainty", type=float, default=None,
+                        help="Render Grad-CAM when either model's uncertainty exceeds this value")
+    parser.add_argument("--gradcam-ids", default=None, help="File with one ID per line to render Grad-CAM for")
+    parser.add_argument("--gradcam-dir", default=GRADCAM_DIR, help="Where flagged Grad-CAM overlays are saved")
+    args = parser.parse_args()
+    
+    if not args.output and not args.db:
+        parser.error("nothing to write: pass --output and/or --db")
+    
+    print("=" * 70)
+    print("🦴 BONE AGE OFFLINE SCORING")
+    print("=" * 70)
+    
+    dataset = ScoringDataset(args.source, args.img_dir)
+    if len(dataset) == 0:
+        print("\n❌ No images found.")
+        return 1
+    
+    # Same checkpoints and version tag as the API, so rows match live traffic
+    version, male_model_path, female_model_path = get_model_registry().active_paths()
+    if args.male_model:
+        version, male_model_path, female_model_path = None, args.male_model, args.female_model
+    inference_model = ModelInference(male_model_path, female_model_path, device=args.device, version=version)
+    loader = DataLoader(
+        dataset,
+        batch_size=args.batch_size,
+        shuffle=False,
+        num_workers=args.workers,
+        collate_fn=collate_scoring,
+        pin_memory=inference_model.device.type == "cuda",
+        persistent_workers=args.workers > 0
+    )
+    
+    db = None
+    if args.db:
+        from database.db import SessionLocal, init_db
+        
+        init_db()
+        db = SessionLocal()
+    
+    flagged_ids = load_flagged_ids(args.gradcam_ids)
+    rows = []
+    failures = []
+    gradcams = 0
+    
+    print(f"\n📸 Images: {len(dataset)}  |  Batch size: {args.batch_size}  |  Workers: {args.workers}")
+    started = time.perf_counter()
+    
+    try:
+        for batch, indices, errors in loader:
+            for idx, error in errors:
+                failures.append({"id": dataset.ids[idx], "image_path": dataset.paths[idx], "error": error})
+            if batch is None:
+                continue
+            
+            results = inference_model.infer_batch(batch)
+            
+            flagged = [
+                idx for idx, result in zip(indices, results)
+                if dataset.ids[idx] in flagged_ids
+                or (args.gradcam_uncertainty is not None and max(
+                    result['male']['uncertainty'], result['female']['uncertainty']
+                ) > args.gradcam_uncertainty)
+            ]
+            gradcam_paths = render_flagged_gradcams(inference_model, dataset, flagged, args.gradcam_dir) if flagged else {}
+            gradcams += len(gradcam_paths)
+            
+            batch_rows = []
+            for idx, result in zip(indices, results):
+                male_gradcam_path, female_gradcam_path = gradcam_paths.get(idx, (None, None))
+                batch_rows.append({
+                    "id": dataset.ids[idx],
+                    "image_path": dataset.paths[idx].replace("\\", "/"),
+                    "male_age": result['male']['age'],
+                    "male_uncertainty": result['male']['uncertainty'],
+                    "male_gradcam_path": male_gradcam_path.replace("\\", "/") if male_gradcam_path else None,
+                    "female_age": result['female']['age'],
+                    "female_uncertainty": result['female']['uncertainty'],
+                    "female_gradcam_path": female_gradcam_path.replace("\\", "/") if female_gradcam_path else None,
+                    "age_group": dataset.age_groups[idx],
+                    "boneage": dataset.boneages[idx],
+                    "prediction_id": None
+                })
+            
+            if db is not None:
+                write_to_database(db, batch_rows, inference_model.served_version())
+            rows.extend(batch_rows)
+            
+            elapsed = time.perf_counter() - started
+            print(f"  {len(rows) + len(failures)}/{len(dataset)} scored  ({len(rows) / elapsed:.1f} images/s)")
+    finally:
+        if db is not None:
+            db.close()
+    
+    elapsed = time.perf_counter() - started
+    if args.output:
+        write_output(args.output, rows)
+    
+    print("\n" + "=" * 70)
+    print(f"✅ Scored: {len(rows)}/{len(dataset)}  |  ❌ Failed: {len(failures)}  |  🔥 Grad-CAMs: {gradcams}")
+    print(f"⚡ {len(rows) / elapsed:.1f} images/s over {elapsed:.1f}s")
+    for failure in failures:
+        print(f"   ❌ {failure['image_path']}: {failure['error']}")
+    if args.output:
+        print(f"💾 Results saved to: {args.output}")
+    if args.db:
+        print("🗄️  Predictions written to the database")
+    print("=" * 70)
+    
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
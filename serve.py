@@ -0,0 +1,251 @@
+"""
+Prefork Server
+Loads both models once in a parent process and forks uvicorn workers that share the weights.
+
+The parent loads the serving models, moves their parameters into shared
+memory, and then forks --workers processes. Every worker accepts connections
+from one inherited listening socket. Forked workers map the parent's weight
+pages, so N workers hold one copy of each ResNet18 + ViT-B/16 model instead
+of N. Other objects built before the fork (backend runners, quantized copies)
+are shared copy-on-write. Each worker warms up in its own startup hook, and
+once all workers are ready the parent prints RSS, PSS and shared/private
+memory per process from /proc.
+
+Linux only (fork, /proc/<pid>/smaps_rollup).
+
+Usage:
+    python serve.py --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def process_memory(pid):
+    """
+    Memory of a process in MB from /proc
+    
+    Returns:
+        dict: Rss, Pss, Shared_* and Private_* (Pss and the split need smaps_rollup)
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        # Kernels before 4.14: RSS only
+        with open(f"/proc/{pid}/status") as f:
+            lines = [line.replace("VmRSS", "Rss") for line in f if line.startswith("VmRSS")]
+    
+    memory = {}
+    for line in lines:
+        key, _, value = line.partition(":")
+        if key in MEMORY_FIELDS:
+            memory[key] = round(int(value.split()[0]) / 1024, 1)
+    return memory
+
+
+def share_model_weights(inference_model):
+    """
+    Move model parameters and buffers into shared memory
+    
+    Shared pages stay shared even if a worker writes near them, unlike
+    copy-on-write pages of the parent heap.
+    
+    Returns:
+        float: MB of weights moved
+    """
+    total = 0
+    models = {id(model): model for model in (inference_model.male_model, inference_model.female_model)}
+    for model in models.values():
+        model.share_memory()
+        total += sum(tensor.numel() * tensor.element_size() for tensor in model.state_dict().values())
+    return total / (1024 * 1024)
+
+
+def create_socket(host, port, backlog=2048):
+    """Listening socket inherited by every worker"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(api, sock, ready_fd, args):
+    """Worker process body: serve the app on the inherited socket (never returns)"""
+    import torch
+    import uvicorn
+    from utils.runtime import get_runtime_settings
+    
+    # Intra-op pools are per process; size this worker's pool after the fork
+    # (with the parent's auto-tune result, if any)
+    torch.set_num_threads(get_runtime_settings().intra_op_threads)
+    
+    async def report_ready():
+        # Runs after the app's own startup (database, warm-up)
+        os.write(ready_fd, f"{os.getpid()}\n".encode())
+    
+    api.app.router.on_startup.append(report_ready)
+    
+    config = uvicorn.Config(api.app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    server = uvicorn.Server(config)
+    try:
+        server.run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+
+def spawn_worker(api, sock, ready_fd, args):
+    """Fork one worker and return its pid"""
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        run_worker(api, sock, ready_fd, args)
+    return pid
+
+
+def wait_until_ready(read_fd, workers, timeout):
+    """Collect worker pids as they finish startup"""
+    ready = set()
+    buffer = b""
+    deadline = time.monotonic() + timeout
+    while len(ready) < len(workers) and time.monotonic() < deadline:
+        readable, _, _ = select.select([read_fd], [], [], max(0.0, deadline - time.monotonic()))
+        if not readable:
+            break
+        buffer += os.read(read_fd, 4096)
+        *lines, buffer = buffer.split(b"\n")
+        ready.update(int(line) for line in lines if line)
+    return ready
+
+
+def print_memory_report(workers, parent_weights_mb):
+    """Print RSS/PSS of the parent and each worker"""
+    print("\n" + "=" * 70)
+    print("🧠 MEMORY PER PROCESS (MB)")
+    print("=" * 70)
+    print(f"{'process':>14}{'RSS':>10}{'PSS':>10}{'shared':>10}{'private':>10}")
+    
+    total_pss = 0.0
+    for label, pid in [("parent", os.getpid())] + [(f"worker {pid}", pid) for pid in workers]:
+        try:
+            memory = process_memory(pid)
+        except OSError:
+            continue
+        shared = memory.get("Shared_Clean", 0) + memory.get("Shared_Dirty", 0)
+        private = memory.get("Private_Clean", 0) + memory.get("Private_Dirty", 0)
+        total_pss += memory.get("Pss", 0)
+        print(f"{label:>14}{memory.get('Rss', 0):>10}{memory.get('Pss', '-'):>10}"
+              f"{round(shared, 1) if 'Pss' in memory else '-':>10}{round(private, 1) if 'Pss' in memory else '-':>10}")
+    
+    print("-" * 70)
+    print(f"Shared model weights: {parent_weights_mb:.0f} MB (one copy for {len(workers)} workers)")
+    if total_pss:
+        print(f"Total PSS: {total_pss:.0f} MB")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from forked workers sharing one copy of the models")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("BONEAGE_WORKERS", "2")))
+    parser.add_argument("--ready-timeout", type=float, default=600,
+                        help="Seconds to wait for all workers to warm up before the memory report")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    
+    if not hasattr(os, "fork"):
+        print("✗ serve.py needs fork(); use `python app.py` with BONEAGE_WORKERS on this platform")
+        return 1
+    
+    # Read by utils.runtime at import: split the CPU budget between workers
+    os.environ["BONEAGE_WORKERS"] = str(args.workers)
+    
+    # Imported before the fork so module pages are shared too
+    import app as api
+    from database.db import engine, init_db
+    from utils.inference import get_inference_model
+    from utils.runtime import get_runtime_settings
+    
+    print("=" * 70)
+    print(f"🍴 BONE AGE PREFORK SERVER ({args.workers} workers)")
+    print("=" * 70)
+    
+    init_db()
+    # Workers must not inherit pooled SQLite connections
+    engine.dispose()
+    
+    # Inter-op threads can only be set before the first parallel op
+    runtime_settings = get_runtime_settings()
+    runtime_settings.apply()
+    inference_model = get_inference_model()
+    
+    # Tune once here rather than in every worker at the same time, where the
+    # workers would compete for cores and skew each other's timings
+    if runtime_settings.auto_tune:
+        runtime_settings.autotune(inference_model)
+    weights_mb = share_model_weights(inference_model)
+    print(f"📎 {weights_mb:.0f} MB of model weights moved to shared memory")
+    
+    # Keep the parent's objects out of future collections so workers do not
+    # dirty the shared heap pages by touching their GC headers
+    gc.collect()
+    gc.freeze()
+    
+    sock = create_socket(args.host, args.port)
+    read_fd, ready_fd = os.pipe()
+    workers = {spawn_worker(api, sock, ready_fd, args) for _ in range(args.workers)}
+    print(f"🚀 Listening on http://{args.host}:{args.port} (workers: {', '.join(map(str, sorted(workers)))})")
+    
+    stopping = False
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    
+    ready = wait_until_ready(read_fd, workers, args.ready_timeout)
+    if not stopping:
+        if len(ready) < len(workers):
+            print(f"⚠️  Only {len(ready)}/{len(workers)} workers ready after {args.ready_timeout:.0f}s")
+        print_memory_report(sorted(workers), weights_mb)
+    
+    # Replace workers that die; exit once all have stopped after a signal
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"⚠️  Worker {pid} exited (status {status}); starting a replacement")
+            workers.add(spawn_worker(api, sock, ready_fd, args))
+    
+    sock.close()
+    print("👋 All workers stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
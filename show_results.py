@@ -37,9 +37,9 @@ if response.status_code == 200:
     print("📁 GENERATED FILES")
     print('=' * 70)
     print(f"📂 Location: storage/patients/{patient_id}/")
-    print(f"   ✅ original.png - Your uploaded X-ray")
-    print(f"   ✅ male_gradcam.png - Male model heatmap visualization")
-    print(f"   ✅ female_gradcam.png - Female model heatmap visualization")
+    print(f"   ✅ <upload_id>_original.png - Your uploaded X-ray")
+    print(f"   ✅ <upload_id>_male_gradcam.png - Male model heatmap visualization")
+    print(f"   ✅ <upload_id>_female_gradcam.png - Female model heatmap visualization")
     
     print(f"\n{'=' * 70}")
     print("💾 DATA STORED IN")
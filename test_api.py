@@ -1,5 +1,6 @@
 import requests
 import os
+import json
 from PIL import Image
 import numpy as np
 
@@ -7,6 +8,7 @@ import numpy as np
 API_URL = "http://localhost:8000"
 SAMPLE_IMAGE_PATH = "test_xray.png"
 PATIENT_ID = "TEST_PATIENT_001"
+BATCH_PATIENT_IDS = ["TEST_BATCH_001", "TEST_BATCH_002"]
 
 
 def create_sample_xray():
@@ -77,7 +79,7 @@ def test_predict():
             else:
                 print(f"✗ Error: {response.text}")
                 return False
-                
+    
     except Exception as e:
         print(f"✗ Error: {e}")
         return False
@@ -109,7 +111,143 @@ def test_get_results():
         else:
             print(f"✗ Error: {response.text}")
             return False
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        return False
+
+
+def test_predict_batch():
+    """Test batch prediction endpoint (NDJSON lines, per-image errors)"""
+    print("\n" + "=" * 50)
+    print("Testing Batch Prediction Endpoint")
+    print("=" * 50)
+    
+    try:
+        with open(SAMPLE_IMAGE_PATH, 'rb') as f:
+            image_bytes = f.read()
+        
+        # The second part claims to be a PNG but cannot be decoded
+        files = [
+            ('images', ('test_xray.png', image_bytes, 'image/png')),
+            ('images', ('broken.png', b'not an image', 'image/png'))
+        ]
+        data = {'patient_ids': BATCH_PATIENT_IDS, 'gradcam': 'lazy'}
+        
+        print(f"📤 Uploading 2 images for patients: {', '.join(BATCH_PATIENT_IDS)}")
+        response = requests.post(f"{API_URL}/predict/batch", files=files, data=data, stream=True)
+        print(f"Status Code: {response.status_code}")
+        if response.status_code != 200:
+            print(f"✗ Error: {response.text}")
+            return False
+        
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+        for line in lines:
+            print(f"  {line['status']}: {json.dumps(line)[:120]}")
+        
+        by_status = {}
+        for line in lines:
+            by_status.setdefault(line['status'], []).append(line)
+        successes = by_status.get('success', [])
+        errors = by_status.get('error', [])
+        summary = by_status.get('summary', [])
+        
+        if lines[-1]['status'] != 'summary' or len(summary) != 1:
+            print("✗ Expected exactly one summary line at the end")
+            return False
+        summary = summary[0]
+        if len(successes) != 1 or successes[0]['index'] != 0 or 'age' not in successes[0]['male_prediction']:
+            print("✗ Expected a success line for image 0")
+            return False
+        if len(errors) != 1 or errors[0]['index'] != 1 or errors[0]['patient_id'] != BATCH_PATIENT_IDS[1]:
+            print("✗ Expected an error line for image 1")
+            return False
+        if not summary['committed'] or summary['succeeded'] != 1 or summary['failed'] != 1:
+            print(f"✗ Unexpected summary: {summary}")
+            return False
+        if [entry['index'] for entry in summary['predictions']] != [0]:
+            print(f"✗ Expected prediction IDs for image 0 only: {summary['predictions']}")
+            return False
+        
+        prediction = summary['predictions'][0]
+        print(f"\n✓ Batch committed, prediction ID {prediction['prediction_id']}")
+        
+        # The committed row is visible through the results endpoint
+        response = requests.get(f"{API_URL}/results/{BATCH_PATIENT_IDS[0]}")
+        stored_ids = [pred['prediction_id'] for pred in response.json().get('predictions', [])]
+        if prediction['prediction_id'] not in stored_ids:
+            print(f"✗ Prediction {prediction['prediction_id']} not found in /results")
+            return False
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        return False
+
+
+def test_lazy_gradcam():
+    """Test on-demand Grad-CAM rendering for a lazy prediction"""
+    print("\n" + "=" * 50)
+    print("Testing Lazy Grad-CAM Endpoint")
+    print("=" * 50)
+    
+    try:
+        with open(SAMPLE_IMAGE_PATH, 'rb') as f:
+            files = {'image': ('test_xray.png', f, 'image/png')}
+            data = {'patient_id': PATIENT_ID, 'gradcam': 'lazy'}
+            response = requests.post(f"{API_URL}/predict", files=files, data=data)
+        if response.status_code != 200:
+            print(f"✗ Prediction failed: {response.text}")
+            return False
+        
+        result = response.json()
+        for sex in ('male', 'female'):
+            gradcam = result[f'{sex}_prediction']
+            if gradcam['gradcam_path'] is not None:
+                print(f"✗ Lazy {sex} prediction already has a heatmap file")
+                return False
             
+            # First request renders the heatmap, the second serves the saved file
+            for attempt in ('render', 'cached'):
+                response = requests.get(f"{API_URL}{gradcam['gradcam_url']}")
+                print(f"  {sex} ({attempt}): {response.status_code} {response.headers.get('content-type')}")
+                if response.status_code != 200 or response.headers.get('content-type') != 'image/png':
+                    print(f"✗ Error: {response.text[:200]}")
+                    return False
+        
+        response = requests.get(f"{API_URL}/gradcam/{result['prediction_id']}/other")
+        if response.status_code != 404:
+            print(f"✗ Expected 404 for an unknown sex, got {response.status_code}")
+            return False
+        
+        print("\n✓ Lazy Grad-CAM rendered and served")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        return False
+
+
+def test_ready_and_metrics():
+    """Test readiness probe and Prometheus metrics endpoints"""
+    print("\n" + "=" * 50)
+    print("Testing Ready and Metrics Endpoints")
+    print("=" * 50)
+    
+    try:
+        response = requests.get(f"{API_URL}/ready")
+        ready = response.json()
+        print(f"Ready: {response.status_code} {ready['ready']} (database: {ready['database']})")
+        if response.status_code != 200 or not ready['database']['reachable']:
+            return False
+        
+        response = requests.get(f"{API_URL}/metrics")
+        print(f"Metrics: {response.status_code}")
+        if response.status_code != 200 or 'boneage_stage_duration_seconds_bucket' not in response.text:
+            print("✗ Stage histograms missing after predictions")
+            return False
+        return True
+    
     except Exception as e:
         print(f"✗ Error: {e}")
         return False
@@ -128,7 +266,10 @@ def main():
     results = {
         "Health Check": test_health(),
         "Prediction": test_predict(),
-        "Get Results": test_get_results()
+        "Get Results": test_get_results(),
+        "Batch Prediction": test_predict_batch(),
+        "Lazy Grad-CAM": test_lazy_gradcam(),
+        "Ready and Metrics": test_ready_and_metrics()
     }
     
     # Summary
@@ -0,0 +1,206 @@
+import os
+import torch
+
+# Inference backends for the no-grad forward path
+BACKENDS = ("eager", "torchscript", "compile", "onnx")
+
+# Backend selected for ModelInference (falls back to eager if unavailable)
+INFERENCE_BACKEND = os.environ.get("BONEAGE_BACKEND", "eager")
+
+# Maximum absolute difference from eager outputs accepted by the parity check
+PARITY_ATOL = float(os.environ.get("BONEAGE_PARITY_ATOL", "1e-3"))
+
+# Artifact file suffix for exported backends
+ARTIFACT_SUFFIXES = {
+    "torchscript": ".ts",
+    "onnx": ".onnx"
+}
+
+
+def artifact_path(model_path, backend):
+    """
+    Get the exported artifact path for a checkpoint
+    
+    Args:
+        model_path: Path to the .pth checkpoint
+        backend: 'torchscript' or 'onnx'
+    
+    Returns:
+        str: Artifact path next to the checkpoint
+    """
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIXES[backend]
+
+
+def example_input(batch_size=2, device='cpu'):
+    """Deterministic input used for tracing and parity checks"""
+    generator = torch.Generator().manual_seed(0)
+    return torch.rand(batch_size, 1, 224, 224, generator=generator).mul(2).sub(1).to(device)
+
+
+def export_torchscript(model, path, device='cpu'):
+    """
+    Trace a BoneAgeModel and save it as TorchScript
+    
+    Args:
+        model: BoneAgeModel in eval mode
+        path: Output .ts path
+        device: Device for the example input
+    
+    Returns:
+        str: path
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input(device=device))
+    traced.save(path)
+    return path
+
+
+def export_onnx(model, path, device='cpu', opset_version=17):
+    """
+    Export a BoneAgeModel to ONNX with a dynamic batch dimension
+    
+    Args:
+        model: BoneAgeModel in eval mode
+        path: Output .onnx path
+        device: Device for the example input
+        opset_version: ONNX opset
+    
+    Returns:
+        str: path
+    """
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            example_input(device=device),
+            path,
+            input_names=["image"],
+            output_names=["grp", "unc"],
+            dynamic_axes={"image": {0: "batch"}, "grp": {0: "batch"}, "unc": {0: "batch"}},
+            opset_version=opset_version
+        )
+    return path
+
+
+class EagerRunner:
+    """Plain PyTorch forward under no_grad"""
+    
+    name = "eager"
+    
+    def __init__(self, model):
+        self.model = model
+    
+    def __call__(self, input_tensor):
+        with torch.no_grad():
+            return self.model(input_tensor)
+
+
+class TorchScriptRunner:
+    """Forward through a traced, frozen TorchScript module"""
+    
+    name = "torchscript"
+    
+    def __init__(self, path, device):
+        module = torch.jit.load(path, map_location=device)
+        module.eval()
+        self.module = torch.jit.optimize_for_inference(module)
+    
+    def __call__(self, input_tensor):
+        with torch.no_grad():
+            return self.module(input_tensor)
+
+
+class CompileRunner:
+    """Forward through torch.compile (graph captured on first call)"""
+    
+    name = "compile"
+    
+    def __init__(self, model):
+        self.module = torch.compile(model, dynamic=True)
+    
+    def __call__(self, input_tensor):
+        with torch.no_grad():
+            return self.module(input_tensor)
+
+
+class OnnxRuntimeRunner:
+    """Forward through an ONNX Runtime CPU session"""
+    
+    name = "onnx"
+    
+    def __init__(self, path):
+        import onnxruntime as ort
+        
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+    
+    def __call__(self, input_tensor):
+        grp, unc = self.session.run(None, {"image": input_tensor.detach().cpu().numpy()})
+        device = input_tensor.device
+        return torch.from_numpy(grp).to(device), torch.from_numpy(unc).to(device)
+
+
+def check_parity(model, runner, device='cpu', atol=PARITY_ATOL):
+    """
+    Compare a runner's grp/unc outputs against the eager model
+    
+    Args:
+        model: Eager BoneAgeModel
+        runner: Backend runner to check
+        device: Device for the example input
+        atol: Maximum accepted absolute difference
+    
+    Returns:
+        tuple: (passed, {'grp': max abs diff, 'unc': max abs diff})
+    """
+    inputs = example_input(device=device)
+    with torch.no_grad():
+        expected_grp, expected_unc = model(inputs)
+    actual_grp, actual_unc = runner(inputs)
+    
+    diffs = {
+        "grp": (expected_grp - actual_grp).abs().max().item(),
+        "unc": (expected_unc - actual_unc).abs().max().item()
+    }
+    passed = all(diff <= atol for diff in diffs.values())
+    return passed, diffs
+
+
+def create_runner(model, model_path, backend=INFERENCE_BACKEND, device='cpu', model_name="Model"):
+    """
+    Build the forward runner for a model, falling back to eager on failure
+    
+    Exported backends (torchscript, onnx) read the artifact produced by
+    export_model.py next to the checkpoint. Every non-eager runner must pass
+    the parity check against the eager model before it is used.
+    
+    Args:
+        model: Eager BoneAgeModel in eval mode
+        model_path: Checkpoint path (used to locate exported artifacts)
+        backend: One of BACKENDS
+        device: torch.device the model lives on
+        model_name: Name used in log messages
+    
+    Returns:
+        Runner with a `name` attribute, callable as runner(input_tensor)
+    """
+    if backend == "eager":
+        return EagerRunner(model)
+    
+    try:
+        if backend == "torchscript":
+            runner = TorchScriptRunner(artifact_path(model_path, backend), device)
+        elif backend == "compile":
+            runner = CompileRunner(model)
+        elif backend == "onnx":
+            runner = OnnxRuntimeRunner(artifact_path(model_path, backend))
+        else:
+            raise ValueError(f"unknown backend '{backend}', expected one of {BACKENDS}")
+        
+        passed, diffs = check_parity(model, runner, device)
+        if not passed:
+            raise RuntimeError(f"parity check failed (max diff grp={diffs['grp']:.2e}, unc={diffs['unc']:.2e})")
+        
+        print(f"✓ {model_name} model using {backend} backend")
+        return runner
+    except Exception as e:
+        print(f"⚠ {backend} backend unavailable for {model_name} model ({e}); falling back to eager")
+        return EagerRunner(model)
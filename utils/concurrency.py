@@ -0,0 +1,106 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Thread pool size for blocking pipeline stages (model, PIL, OpenCV, SQLite, MLflow)
+EXECUTOR_WORKERS = int(os.environ.get("BONEAGE_EXECUTOR_WORKERS", "4"))
+
+# Requests admitted into the pipeline at once; beyond this /predict answers 503
+MAX_INFLIGHT_REQUESTS = int(os.environ.get("BONEAGE_MAX_INFLIGHT", "32"))
+
+
+class PipelineSaturated(Exception):
+    """Raised when the pipeline has no capacity left for another request"""
+
+
+class PipelineExecutor:
+    """
+    Bounded executor that keeps blocking work off the asyncio event loop
+
+    Blocking stages are run on a fixed-size thread pool. Admission control
+    caps the number of requests in flight so that a burst of uploads is
+    rejected early instead of queueing unbounded work behind the pool.
+    """
+
+    def __init__(self, max_workers=EXECUTOR_WORKERS, max_inflight=MAX_INFLIGHT_REQUESTS):
+        """
+        Args:
+            max_workers: Number of worker threads for blocking stages
+            max_inflight: Maximum number of admitted requests at a time
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_inflight = max(1, max_inflight)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="boneage-worker"
+        )
+
+        # Only touched from the event loop thread, so no lock is needed
+        self.inflight = 0
+        self.rejected = 0
+
+    @property
+    def executor(self):
+        """Underlying concurrent.futures executor"""
+        return self._pool
+
+    @contextlib.asynccontextmanager
+    async def admit(self):
+        """
+        Reserve a pipeline slot for the duration of a request
+
+        Raises:
+            PipelineSaturated: If max_inflight requests are already running
+        """
+        if self.inflight >= self.max_inflight:
+            self.rejected += 1
+            raise PipelineSaturated(
+                f"Server busy: {self.inflight} requests in flight (limit {self.max_inflight})"
+            )
+
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking callable on the worker pool and await its result
+
+        The callable runs in a copy of the caller's context, so request-scoped
+        context variables (e.g. stage timing traces) are visible to it.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._pool, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool"""
+        self._pool.shutdown(wait=wait)
+
+    def get_stats(self):
+        """Get admission and pool metrics"""
+        return {
+            "workers": self.max_workers,
+            "max_inflight": self.max_inflight,
+            "inflight": self.inflight,
+            "rejected": self.rejected
+        }
+
+
+# Global executor instance
+_executor_instance = None
+
+
+def get_pipeline_executor():
+    """Get or create global pipeline executor"""
+    global _executor_instance
+    if _executor_instance is None:
+        _executor_instance = PipelineExecutor()
+    return _executor_instance
@@ -5,31 +5,35 @@ from PIL import Image
 import matplotlib.pyplot as plt
 import io
 import base64
+import threading
 
 
 class GradCAMGenerator:
-    """Enhanced Grad-CAM implementation for bone age models"""
+    """
+    Enhanced Grad-CAM implementation for bone age models
+    
+    Activations are captured per call in thread-local storage and gradients
+    are returned directly by torch.autograd.grad, so one generator can be
+    shared by concurrent requests running in different threads without
+    reading each other's tensors.
+    """
     
     def __init__(self, model, target_layer):
         self.model = model
-        self.gradients = None
-        self.activations = None
+        self._local = threading.local()
         
-        # Register hooks
+        # Register hook
         target_layer.register_forward_hook(self._save_activations)
-        target_layer.register_full_backward_hook(self._save_gradients)
     
     def _save_activations(self, module, inp, out):
-        """Save forward pass activations"""
-        self.activations = out.detach()
-    
-    def _save_gradients(self, module, grad_in, grad_out):
-        """Save backward pass gradients"""
-        self.gradients = grad_out[0].detach()
+        """Save forward pass activations for the call running in this thread"""
+        capture = getattr(self._local, 'capture', None)
+        if capture is not None:
+            capture['activations'] = out
     
     def generate_heatmap(self, input_tensor, class_idx=None):
         """
-        Generate Grad-CAM heatmap
+        Generate Grad-CAM heatmap for a single image
         
         Args:
             input_tensor: Input image tensor [1, 1, 224, 224]
@@ -38,27 +42,88 @@ class GradCAMGenerator:
         Returns:
             numpy array: Heatmap [H, W]
         """
-        self.model.eval()
-        self.model.zero_grad()
+        if input_tensor.shape[0] != 1:
+            raise ValueError(
+                f"generate_heatmap takes one image, got {input_tensor.shape[0]}; use generate_heatmaps for batches"
+            )
+        return self.generate_heatmaps(input_tensor, class_idx)[0]
+    
+    def generate_heatmaps(self, input_tensor, class_idx=None):
+        """
+        Generate Grad-CAM heatmaps for a batch
         
-        # Forward pass
-        grp_output, unc_output = self.model(input_tensor)
+        Args:
+            input_tensor: Input image tensor [N, 1, 224, 224]
+            class_idx: Target class index (default: argmax of predictions)
         
-        # Use argmax class if not specified
-        if class_idx is None:
-            class_idx = grp_output.argmax(dim=1).item()
+        Returns:
+            numpy array: Heatmaps [N, H, W], also for N = 1
+        """
+        _, _, heatmaps = self.forward_with_heatmap(input_tensor, class_idx)
+        return heatmaps
+    
+    def forward_with_heatmap(self, input_tensor, class_idx=None):
+        """
+        Run a single grad-enabled forward pass and build Grad-CAM from it
         
-        # Backward pass
-        grp_output[:, class_idx].backward()
+        The model outputs of this forward are returned alongside the heatmaps,
+        so callers do not need a separate no_grad forward for the prediction.
         
-        # Generate CAM
-        weights = self.gradients.mean(dim=(2, 3), keepdim=True)
-        cam = (weights * self.activations).sum(dim=1).squeeze()
+        Args:
+            input_tensor: Input image tensor [N, 1, 224, 224]
+            class_idx: Target class index (default: argmax of predictions)
+        
+        Returns:
+            tuple: (grp_output, unc_output, heatmaps) where the outputs are
+                   detached tensors and heatmaps is a numpy array [N, H, W]
+        """
+        self.model.eval()
+        
+        capture = {}
+        self._local.capture = capture
+        try:
+            with torch.enable_grad():
+                # Forward pass
+                grp_output, unc_output = self.model(input_tensor)
+                activations = capture['activations']
+                
+                # Use argmax class if not specified
+                if class_idx is None:
+                    target = grp_output.argmax(dim=1, keepdim=True)
+                else:
+                    target = torch.full(
+                        (grp_output.shape[0], 1), class_idx,
+                        dtype=torch.long, device=grp_output.device
+                    )
+                
+                # Gradients w.r.t. the target layer only; parameter .grad is
+                # left untouched. Samples are independent in eval mode, so the
+                # summed target scores give per-sample gradients
+                score = grp_output.gather(1, target).sum()
+                gradients, = torch.autograd.grad(score, activations)
+        finally:
+            self._local.capture = None
+        
+        heatmaps = self._compute_cam(activations.detach(), gradients)
+        return grp_output.detach(), unc_output.detach(), heatmaps
+    
+    @staticmethod
+    def _compute_cam(activations, gradients):
+        """
+        Build normalized Grad-CAM maps from captured activations and gradients
+        
+        Returns:
+            numpy array: Heatmaps [N, H, W] scaled to [0, 1]
+        """
+        weights = gradients.mean(dim=(2, 3), keepdim=True)
+        cam = (weights * activations).sum(dim=1)
         
-        # Apply ReLU and normalize
+        # Apply ReLU and normalize each sample independently
         cam = torch.relu(cam)
         cam = cam.cpu().numpy()
-        cam = (cam - cam.min()) / (cam.max() - cam.min() + 1e-8)
+        cam_min = cam.min(axis=(1, 2), keepdims=True)
+        cam_max = cam.max(axis=(1, 2), keepdims=True)
+        cam = (cam - cam_min) / (cam_max - cam_min + 1e-8)
         
         return cam
     
@@ -2,6 +2,14 @@ import torch
 import torch.nn as nn
 import sys
 import os
+import time
+import copy
+import hashlib
+import asyncio
+import functools
+import itertools
+import contextvars
+from collections import namedtuple
 from PIL import Image
 import numpy as np
 
@@ -11,12 +19,136 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'male_boneage', 'm
 from model import BoneAgeModel
 from utils.augmentation import eval_transform
 from utils.gradcam_utils import create_gradcam
+from utils.concurrency import get_pipeline_executor
+from utils.backends import create_runner, EagerRunner, INFERENCE_BACKEND
+from utils.metrics import stage, observe, start_trace, current_trace, record_request_metrics
+
+# Micro-batching settings for the request-coalescing scheduler
+BATCH_MAX_SIZE = int(os.environ.get("BONEAGE_BATCH_MAX_SIZE", "16"))
+BATCH_WINDOW_MS = float(os.environ.get("BONEAGE_BATCH_WINDOW_MS", "10"))
+
+# Batch sizes run through both models at startup/before a model swap
+# (comma separated; empty disables warm-up). Grad-CAM is warmed at batch 1.
+WARMUP_BATCH_SIZES = [
+    int(size) for size in os.environ.get("BONEAGE_WARMUP_BATCH_SIZES", f"1,{BATCH_MAX_SIZE}").split(",")
+    if size.strip()
+]
+
+# Quantized inference mode: 'none' or 'dynamic' (int8 nn.Linear weights)
+QUANTIZE_MODE = os.environ.get("BONEAGE_QUANTIZE", "none")
+
+
+def load_checkpoint(model_path, device='cpu'):
+    """
+    Load a checkpoint file, memory-mapping it when the format allows
+    
+    Args:
+        model_path: Path to the .pth checkpoint
+        device: Device to map tensors to
+    
+    Returns:
+        Checkpoint object (state dict or dict containing one)
+    """
+    try:
+        # mmap avoids reading the whole file into a second buffer (torch>=2.1,
+        # zipfile checkpoints only); build_model copies the tensors out of the
+        # mapping, so nothing keeps depending on the file afterwards
+        return torch.load(model_path, map_location=device, mmap=True)
+    except (TypeError, RuntimeError):
+        return torch.load(model_path, map_location=device)
+
+
+def extract_state_dict(checkpoint):
+    """Get the model state dict from the supported checkpoint formats"""
+    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+        return checkpoint['model_state_dict']
+    elif isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
+        return checkpoint['state_dict']
+    return checkpoint
+
+
+def quantize_dynamic_model(model):
+    """
+    Create a dynamically int8-quantized copy of a BoneAgeModel
+    
+    All nn.Linear layers (the ViT-B/16 MLP blocks plus the fc, grp and unc
+    heads) get int8 weights with activations quantized on the fly. The
+    ResNet18 convolutions stay in fp32. The copy is CPU-only and cannot be
+    used for Grad-CAM (no backward through quantized layers), so the fp32
+    model is kept as well and resident weight memory grows by the int8 copy.
+    
+    Args:
+        model: BoneAgeModel in eval mode
+    
+    Returns:
+        nn.Module: Quantized copy in eval mode
+    """
+    quantized = torch.ao.quantization.quantize_dynamic(
+        copy.deepcopy(model).cpu(),
+        {nn.Linear},
+        dtype=torch.qint8
+    )
+    quantized.eval()
+    return quantized
+
+
+def model_fingerprint(model_paths, backend='eager'):
+    """
+    Short fingerprint of the checkpoints and backend serving predictions
+    
+    Based on file name, size and modification time, so swapping a checkpoint
+    file changes the fingerprint without hashing hundreds of MB of weights.
+    
+    Args:
+        model_paths: Checkpoint paths (None entries are ignored)
+        backend: Runner name (quantized/compiled numerics differ from eager)
+    
+    Returns:
+        str: 12 character hex fingerprint
+    """
+    digest = hashlib.sha256(backend.encode())
+    for path in model_paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+def build_model(state_dict):
+    """
+    Build a BoneAgeModel from a state dict without pretrained downloads
+    
+    The module is created on the meta device (no weight allocation) and the
+    state dict tensors are assigned in place, then copied into private
+    memory: assigned tensors from a memory-mapped checkpoint are pages of
+    the .pth file, and rewriting that file in place (torch.save truncates
+    it) would tear the live weights or raise SIGBUS. Falls back to a regular
+    construct-then-copy load on PyTorch versions without `assign`.
+    
+    Args:
+        state_dict: Model state dict
+    
+    Returns:
+        BoneAgeModel: Model holding the checkpoint weights
+    """
+    try:
+        with torch.device('meta'):
+            model = BoneAgeModel(pretrained=False)
+        model.load_state_dict(state_dict, assign=True)
+        with torch.no_grad():
+            for tensor in itertools.chain(model.parameters(), model.buffers()):
+                tensor.data = tensor.data.clone()
+    except (TypeError, AttributeError):
+        model = BoneAgeModel(pretrained=False)
+        model.load_state_dict(state_dict)
+    return model
 
 
 class ModelInference:
     """Handles loading and inference for male and female bone age models"""
     
-    def __init__(self, male_model_path, female_model_path=None, device='cpu'):
+    def __init__(self, male_model_path, female_model_path=None, device='cpu',
+                 backend=INFERENCE_BACKEND, quantize=QUANTIZE_MODE, version=None):
         """
         Initialize models
         
@@ -24,10 +156,19 @@ class ModelInference:
             male_model_path: Path to male model weights
             female_model_path: Path to female model weights (optional)
             device: Device to run inference on ('cpu' or 'cuda')
+            backend: Forward backend for predictions without Grad-CAM
+                     ('eager', 'torchscript', 'compile' or 'onnx')
+            quantize: 'dynamic' to serve predictions without Grad-CAM from an
+                      int8 dynamically quantized copy (CPU only, overrides
+                      backend); 'none' to disable
+            version: Registry version name; prefixed to model_version
         """
         self.device = torch.device(device if torch.cuda.is_available() else 'cpu')
         print(f"Using device: {self.device}")
         
+        startup_start = time.perf_counter()
+        self.load_timings = {}
+        
         # Load male model
         self.male_model = self._load_model(male_model_path, "Male")
         
@@ -38,6 +179,36 @@ class ModelInference:
             print("⚠ Female model not found, using male model for both predictions")
             self.female_model = self.male_model
         
+        # When both heads share one module a single forward serves both
+        self.shared_model = self.female_model is self.male_model
+        
+        # Forward runners for the no-grad path (Grad-CAM always runs eager)
+        if quantize == 'dynamic' and self.device.type != 'cpu':
+            print("⚠ Dynamic quantization is CPU-only, ignoring BONEAGE_QUANTIZE")
+            quantize = 'none'
+        
+        if quantize == 'dynamic':
+            self.male_runner = self._quantized_runner(self.male_model, "Male")
+        else:
+            self.male_runner = create_runner(self.male_model, male_model_path, backend, self.device, "Male")
+        
+        if self.shared_model:
+            self.female_runner = self.male_runner
+        elif quantize == 'dynamic':
+            self.female_runner = self._quantized_runner(self.female_model, "Female")
+        else:
+            self.female_runner = create_runner(self.female_model, female_model_path, backend, self.device, "Female")
+        self.backend = self.male_runner.name
+        
+        # Identifies the weights and numerics behind a prediction
+        self.version = version
+        self.model_paths = (male_model_path, female_model_path if not self.shared_model else None)
+        fingerprint = model_fingerprint(self.model_paths, self.backend)
+        self.model_version = f"{version}@{fingerprint}" if version else fingerprint
+        # Grad-CAM forwards always run the eager fp32 model, whatever the backend
+        eager_fingerprint = model_fingerprint(self.model_paths, 'eager')
+        self.gradcam_model_version = f"{version}@{eager_fingerprint}" if version else eager_fingerprint
+        
         # Age group mapping (0-3 years ranges)
         self.age_groups = {
             0: (0, 5),
@@ -49,29 +220,69 @@ class ModelInference:
         # Setup Grad-CAM
         self.male_gradcam = create_gradcam(self.male_model, self.male_model.ca)
         self.female_gradcam = create_gradcam(self.female_model, self.female_model.ca)
+        
+        # Set by warmup()
+        self.warmed_up = False
+        self.warmup_timings = {}
+        
+        self.startup_time = time.perf_counter() - startup_start
+        print(f"⏱ Models ready in {self.startup_time:.2f}s")
     
     def _load_model(self, model_path, model_name):
-        """Load model from checkpoint"""
+        """
+        Load model from checkpoint
+        
+        The architecture is built without pretrained backbone weights (no
+        network access) and the checkpoint tensors are assigned directly
+        into it, so weights are allocated only once. Stage timings are
+        recorded in self.load_timings.
+        """
         try:
-            model = BoneAgeModel()
-            checkpoint = torch.load(model_path, map_location=self.device)
+            timings = {}
+            
+            start = time.perf_counter()
+            checkpoint = load_checkpoint(model_path, self.device)
+            timings['read_s'] = time.perf_counter() - start
             
-            # Handle different checkpoint formats
-            if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
-                model.load_state_dict(checkpoint['model_state_dict'])
-            elif isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
-                model.load_state_dict(checkpoint['state_dict'])
-            else:
-                model.load_state_dict(checkpoint)
+            start = time.perf_counter()
+            model = build_model(extract_state_dict(checkpoint))
+            timings['build_s'] = time.perf_counter() - start
             
+            start = time.perf_counter()
             model.to(self.device)
             model.eval()
-            print(f"✓ {model_name} model loaded successfully")
+            timings['to_device_s'] = time.perf_counter() - start
+            
+            self.load_timings[model_name] = timings
+            print(
+                f"✓ {model_name} model loaded successfully "
+                f"(read {timings['read_s']:.2f}s, build {timings['build_s']:.2f}s, "
+                f"to device {timings['to_device_s']:.2f}s)"
+            )
             return model
         except Exception as e:
             print(f"✗ Error loading {model_name} model: {e}")
             raise
     
+    def _quantized_runner(self, model, model_name):
+        """Build a no-grad runner backed by a dynamic int8 copy of the model"""
+        runner = EagerRunner(quantize_dynamic_model(model))
+        runner.name = "dynamic-int8"
+        print(f"✓ {model_name} model using dynamic int8 quantization")
+        return runner
+    
+    def served_version(self, with_gradcam=False):
+        """
+        Version tag of the numerics that serve a forward
+        
+        Args:
+            with_gradcam: True for grad-enabled (eager) forwards
+        
+        Returns:
+            str: gradcam_model_version or model_version
+        """
+        return self.gradcam_model_version if with_gradcam else self.model_version
+    
     def preprocess_image(self, image_input):
         """
         Preprocess image for inference
@@ -175,6 +386,153 @@ class ModelInference:
                 'original_image': original_image
             }
     
+    def infer_both(self, image_input, with_gradcam=False):
+        """
+        Perform male and female inference from a single preprocessing pass
+        
+        The image is preprocessed once and the tensor is shared by both
+        models. If the female model falls back to the male model, only one
+        forward pass is run and its outputs are reused for both results.
+        
+        Args:
+            image_input: PIL Image or file path
+            with_gradcam: If True, run one grad-enabled forward per model and
+                          build the Grad-CAM heatmap from that same pass
+        
+        Returns:
+            dict: {'male': male results, 'female': female results}
+                  Each result has a 'heatmap' entry when with_gradcam is set.
+        """
+        input_tensor, original_image = self.preprocess_image(image_input)
+        
+        results = self.infer_batch(input_tensor, with_gradcam=with_gradcam)[0]
+        results['male']['original_image'] = original_image
+        results['female']['original_image'] = original_image
+        return results
+    
+    def infer_batch(self, input_batch, with_gradcam=False):
+        """
+        Perform male and female inference on a batch of preprocessed images
+        
+        Args:
+            input_batch: Preprocessed tensor [N, 1, 224, 224], or a list of
+                         [1, 1, 224, 224] tensors from preprocess_image
+            with_gradcam: If True, also build per-image Grad-CAM heatmaps
+                          from the same forward pass
+        
+        Returns:
+            list: One {'male': ..., 'female': ...} dict per image
+        """
+        if isinstance(input_batch, (list, tuple)):
+            input_batch = torch.cat(input_batch)
+        input_batch = input_batch.to(self.device)
+        
+        # Grad-CAM runs inside the forward, so it is timed as its own stage
+        suffix = "gradcam" if with_gradcam else "forward"
+        with stage(f"male_{suffix}"):
+            male_grp, male_unc, male_heatmaps = self._forward('male', input_batch, with_gradcam)
+        if self.shared_model:
+            female_grp, female_unc, female_heatmaps = male_grp, male_unc, male_heatmaps
+        else:
+            with stage(f"female_{suffix}"):
+                female_grp, female_unc, female_heatmaps = self._forward('female', input_batch, with_gradcam)
+        
+        outputs = []
+        for i in range(input_batch.shape[0]):
+            item = slice(i, i + 1)
+            outputs.append({
+                'male': self._build_result(
+                    male_grp[item], male_unc[item], input_batch[item], None,
+                    heatmap=male_heatmaps[i] if with_gradcam else None
+                ),
+                'female': self._build_result(
+                    female_grp[item], female_unc[item], input_batch[item], None,
+                    heatmap=female_heatmaps[i] if with_gradcam else None
+                )
+            })
+        return outputs
+    
+    def warmup(self, batch_sizes=None, with_gradcam=True):
+        """
+        Run throwaway forwards so kernel setup is not paid by the first request
+        
+        Each batch size gets its own forward through both models because
+        backends (and oneDNN/cuDNN) pick kernels per input shape. Timings per
+        stage are recorded in self.warmup_timings.
+        
+        Args:
+            batch_sizes: Batch sizes to run (default: WARMUP_BATCH_SIZES)
+            with_gradcam: Also warm the grad-enabled Grad-CAM path at batch 1
+        
+        Returns:
+            float: Seconds spent
+        """
+        batch_sizes = WARMUP_BATCH_SIZES if batch_sizes is None else batch_sizes
+        timings = {}
+        start = time.perf_counter()
+        
+        for batch_size in batch_sizes:
+            stage_start = time.perf_counter()
+            self.infer_batch(torch.zeros(batch_size, 1, 224, 224, device=self.device))
+            timings[f"batch_{batch_size}_s"] = round(time.perf_counter() - stage_start, 4)
+        
+        if with_gradcam and batch_sizes:
+            stage_start = time.perf_counter()
+            self.infer_batch(torch.zeros(1, 1, 224, 224, device=self.device), with_gradcam=True)
+            timings["gradcam_s"] = round(time.perf_counter() - stage_start, 4)
+        
+        total = time.perf_counter() - start
+        timings["total_s"] = round(total, 4)
+        self.warmup_timings = timings
+        self.warmed_up = True
+        if batch_sizes:
+            print(f"🔥 Warm-up done in {total:.2f}s (batch sizes {', '.join(map(str, batch_sizes))})")
+        return total
+    
+    def infer_stored(self, tensor_store, records, with_gradcam=False):
+        """
+        Perform male and female inference on records from the tensor store
+        
+        The inputs are read from the store's memory map, skipping image
+        decoding and eval_transform.
+        
+        Args:
+            tensor_store: utils.tensor_store.TensorStore
+            records: Record numbers
+            with_gradcam: If True, also build per-image Grad-CAM heatmaps
+        
+        Returns:
+            list: One {'male': ..., 'female': ...} dict per record
+        """
+        return self.infer_batch(tensor_store.load_batch(records, self.device), with_gradcam)
+    
+    def _forward(self, model_type, input_tensor, with_gradcam=False):
+        """
+        Run one forward pass of the male or female model
+        
+        Returns:
+            tuple: (grp_output, unc_output, heatmaps or None)
+        """
+        if with_gradcam:
+            gradcam = self.male_gradcam if model_type == 'male' else self.female_gradcam
+            return gradcam.forward_with_heatmap(input_tensor)
+        
+        runner = self.male_runner if model_type == 'male' else self.female_runner
+        grp_output, unc_output = runner(input_tensor)
+        return grp_output, unc_output, None
+    
+    def _build_result(self, grp_output, unc_output, input_tensor, original_image, heatmap=None):
+        """Package model outputs into the result dict used by infer_* methods"""
+        age, uncertainty = self.predict_age(grp_output, unc_output)
+        return {
+            'age': age,
+            'uncertainty': uncertainty,
+            'grp_logits': grp_output,
+            'input_tensor': input_tensor,
+            'original_image': original_image,
+            'heatmap': heatmap
+        }
+    
     def generate_gradcam(self, input_tensor, original_image, model_type='male'):
         """
         Generate Grad-CAM heatmap
@@ -185,11 +543,28 @@ class ModelInference:
             model_type: 'male' or 'female'
         
         Returns:
-            numpy array: Grad-CAM heatmap
+            numpy array: Grad-CAM heatmap [H, W]
         """
         gradcam = self.male_gradcam if model_type == 'male' else self.female_gradcam
         heatmap = gradcam.generate_heatmap(input_tensor)
         return heatmap
+    
+    def render_gradcam(self, image_input, save_path, model_type='male'):
+        """
+        Generate a Grad-CAM heatmap and save its overlay
+        
+        Args:
+            image_input: PIL Image or file path
+            save_path: Output file path for the overlay PNG
+            model_type: 'male' or 'female'
+        
+        Returns:
+            str: save_path
+        """
+        input_tensor, original_image = self.preprocess_image(image_input)
+        gradcam = self.male_gradcam if model_type == 'male' else self.female_gradcam
+        heatmap = gradcam.generate_heatmap(input_tensor)
+        return gradcam.save_visualization(original_image, heatmap, save_path)
 
 
 # Global inference instance
@@ -197,10 +572,212 @@ _inference_instance = None
 
 
 def get_inference_model():
-    """Get or create global inference instance"""
+    """Get or create global inference instance (the registry's active version)"""
     global _inference_instance
     if _inference_instance is None:
-        male_model_path = "male_boneage_model.pth"
-        female_model_path = "female_boneage_model.pth"
-        _inference_instance = ModelInference(male_model_path, female_model_path)
+        from utils.model_registry import get_model_registry
+        
+        version, male_model_path, female_model_path = get_model_registry().active_paths()
+        _inference_instance = ModelInference(male_model_path, female_model_path, version=version)
     return _inference_instance
+
+
+def get_loaded_inference_model():
+    """Global inference instance if it has been created, without loading it"""
+    return _inference_instance
+
+
+def set_inference_model(inference_model):
+    """
+    Atomically replace the global inference instance
+    
+    Requests hold their own reference to the instance they started with,
+    so in-flight work finishes on the old model, which is released once the
+    last of them completes.
+    
+    Returns:
+        ModelInference: The previous instance (or None)
+    """
+    global _inference_instance
+    previous, _inference_instance = _inference_instance, inference_model
+    return previous
+
+
+
+# A queued request waiting for its slot in a batch
+_PendingRequest = namedtuple(
+    '_PendingRequest', ['inference_model', 'input_tensor', 'with_gradcam', 'future', 'enqueued_at', 'traced']
+)
+
+
+class BatchScheduler:
+    """
+    Coalesces concurrent inference requests into batched model forwards
+    
+    Requests are collected for up to `max_wait_ms` after the first one
+    arrives (or until `max_batch_size` images are queued), stacked into one
+    [N, 1, 224, 224] tensor and run through both models in a single forward.
+    Results are fanned back out to the waiting coroutines.
+    """
+    
+    def __init__(self, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WINDOW_MS, executor=None):
+        """
+        Args:
+            max_batch_size: Maximum number of images per forward
+            max_wait_ms: Maximum time to wait for a batch to fill
+            executor: concurrent.futures executor for model forwards
+                      (default: the event loop's default executor)
+        """
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor = executor
+        self._queue = None
+        self._worker = None
+        
+        # Metrics
+        self.total_batches = 0
+        self.total_images = 0
+        self.batch_size_counts = {}
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+    
+    @property
+    def queue_depth(self):
+        """Number of requests waiting to be batched"""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    async def submit(self, input_tensor, with_gradcam=False, inference_model=None):
+        """
+        Queue one preprocessed image and wait for its result
+        
+        Args:
+            input_tensor: Preprocessed tensor [1, 1, 224, 224]
+            with_gradcam: If True, include Grad-CAM heatmaps in the result
+            inference_model: ModelInference to run on (default: the active
+                             one); pinned so a model swap cannot change the
+                             model under a request that is already queued
+        
+        Returns:
+            dict: {'male': ..., 'female': ...} as returned by infer_batch
+        """
+        loop = asyncio.get_running_loop()
+        self._ensure_worker(loop)
+        
+        if inference_model is None:
+            inference_model = get_inference_model()
+        
+        future = loop.create_future()
+        await self._queue.put(_PendingRequest(
+            inference_model, input_tensor, with_gradcam, future, time.perf_counter(),
+            current_trace() is not None
+        ))
+        return await future
+    
+    def _ensure_worker(self, loop):
+        """Start the batching loop on first use"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            # Fresh context: the loop must not inherit the first caller's trace
+            self._worker = contextvars.Context().run(loop.create_task, self._run())
+    
+    async def _run(self):
+        """Collect requests into batches and dispatch them one at a time"""
+        record_request_metrics()
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            await self._dispatch(batch)
+    
+    async def _dispatch(self, batch):
+        """Run one batch through the models and resolve the waiting futures"""
+        loop = asyncio.get_running_loop()
+        dispatched_at = time.perf_counter()
+        self._record_batch(batch, dispatched_at)
+        
+        # Grad-CAM needs a grad-enabled forward, so split mixed batches; around
+        # a model swap a batch can also hold requests for two model versions
+        groups = {}
+        for request in batch:
+            key = (id(request.inference_model), request.with_gradcam)
+            groups.setdefault(key, []).append(request)
+        
+        for pending in groups.values():
+            inference_model = pending[0].inference_model
+            with_gradcam = pending[0].with_gradcam
+            
+            input_batch = torch.cat([request.input_tensor for request in pending])
+            
+            # Forward stage timings are shared by every request in the batch;
+            # only collected when one of them asked for a debug trace
+            context = contextvars.copy_context()
+            batch_trace = context.run(start_trace) if any(request.traced for request in pending) else {}
+            try:
+                results = await loop.run_in_executor(
+                    self.executor,
+                    functools.partial(context.run, inference_model.infer_batch, input_batch, with_gradcam)
+                )
+            except Exception as e:
+                for request in pending:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            
+            for request, result in zip(pending, results):
+                result['stage_timings'] = {
+                    'batch_queue': dispatched_at - request.enqueued_at,
+                    **batch_trace
+                }
+                # The caller may have gone away (e.g. client disconnect)
+                if not request.future.done():
+                    request.future.set_result(result)
+    
+    def _record_batch(self, batch, dispatched_at):
+        """Update batch size and queue delay metrics"""
+        size = len(batch)
+        self.total_batches += 1
+        self.total_images += size
+        self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+        
+        for request in batch:
+            delay = dispatched_at - request.enqueued_at
+            observe('batch_queue', delay)
+            self.total_queue_delay += delay
+            self.max_queue_delay = max(self.max_queue_delay, delay)
+    
+    def get_stats(self):
+        """Get batching metrics"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.max_wait * 1000.0,
+            "total_batches": self.total_batches,
+            "total_images": self.total_images,
+            "avg_batch_size": round(self.total_images / self.total_batches, 3) if self.total_batches else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "avg_queue_delay_ms": round(self.total_queue_delay / self.total_images * 1000.0, 3) if self.total_images else 0.0,
+            "max_queue_delay_ms": round(self.max_queue_delay * 1000.0, 3),
+            "queue_depth": self.queue_depth
+        }
+
+
+# Global batch scheduler instance
+_scheduler_instance = None
+
+
+def get_batch_scheduler():
+    """Get or create global batch scheduler"""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = BatchScheduler(executor=get_pipeline_executor().executor)
+    return _scheduler_instance
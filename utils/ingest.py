@@ -0,0 +1,204 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+# Largest accepted upload; larger files are rejected before decoding
+MAX_UPLOAD_BYTES = int(float(os.environ.get("BONEAGE_MAX_UPLOAD_MB", "64")) * 1024 * 1024)
+
+# Largest accepted image (width x height); checked from the header before decoding
+MAX_IMAGE_PIXELS = int(os.environ.get("BONEAGE_MAX_IMAGE_PIXELS", "50000000"))
+
+# Longest side of the stored/decoded original; 0 keeps full resolution
+STORED_MAX_SIDE = int(os.environ.get("BONEAGE_STORED_MAX_SIDE", "0"))
+
+# Longest side decoded when the image only feeds the model (offline scoring,
+# re-scoring); eval_transform resizes to 224 anyway
+MODEL_INPUT_MAX_SIDE = int(os.environ.get("BONEAGE_MODEL_INPUT_MAX_SIDE", "1024"))
+
+# PIL modes holding more than 8 bits per grayscale pixel
+HIGH_BIT_DEPTH_MODES = ("I;16", "I;16B", "I;16L", "I;16N", "I", "F")
+
+# File extensions picked up from batch archives
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif")
+
+# Copy buffer used when spooling uploads to disk
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured byte or pixel limits"""
+
+
+def upload_size(fileobj):
+    """
+    Size in bytes of an already spooled upload
+    
+    FastAPI/Starlette stream multipart bodies into a SpooledTemporaryFile in
+    chunks (rolling over to disk past 1 MB), so the upload never has to be
+    read into a bytes object to be measured or decoded.
+    
+    Args:
+        fileobj: Seekable file object (UploadFile.file)
+    
+    Returns:
+        int: Size in bytes
+    """
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def spool_to_disk(fileobj, directory):
+    """
+    Copy an upload into a named file that outlives the request
+    
+    Starlette closes (and discards) multipart spool files once the endpoint
+    returns, so uploads consumed by a streaming response are copied out in
+    fixed-size chunks first.
+    
+    Args:
+        fileobj: Seekable file object (UploadFile.file)
+        directory: Directory owned by the caller, removed when it is done
+    
+    Returns:
+        str: Path of the spooled copy
+    """
+    fileobj.seek(0)
+    handle, path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(handle, "wb") as target:
+        shutil.copyfileobj(fileobj, target, SPOOL_CHUNK_BYTES)
+    return path
+
+
+def is_image_filename(name):
+    """Check a file name against IMAGE_EXTENSIONS, skipping hidden/resource-fork files"""
+    base = os.path.basename(name)
+    return not base.startswith(".") and base.lower().endswith(IMAGE_EXTENSIONS)
+
+
+class ImageArchive:
+    """
+    Read-only view of the images inside a zip or tar archive
+    
+    Members are listed up front but only read one at a time, so an archive
+    of thousands of X-rays is never extracted in full.
+    """
+    
+    def __init__(self, path):
+        """
+        Args:
+            path: Path of a zip or tar (optionally compressed) archive
+        
+        Raises:
+            ValueError: If the file is neither a zip nor a tar archive
+        """
+        self._zip = None
+        self._tar = None
+        if zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+            self._members = {
+                info.filename: info for info in self._zip.infolist()
+                if not info.is_dir() and is_image_filename(info.filename)
+            }
+        else:
+            try:
+                self._tar = tarfile.open(path, mode="r:*")
+            except tarfile.TarError:
+                raise ValueError("Archive must be a zip or tar file")
+            self._members = {
+                member.name: member for member in self._tar.getmembers()
+                if member.isfile() and is_image_filename(member.name)
+            }
+        
+        # Archive order, which is the order results are reported in
+        self.names = list(self._members)
+    
+    def open(self, name):
+        """
+        Open one member for reading
+        
+        Raises:
+            UploadTooLarge: If the member exceeds MAX_UPLOAD_BYTES
+        """
+        member = self._members[name]
+        size = member.file_size if self._zip is not None else member.size
+        if size > MAX_UPLOAD_BYTES:
+            raise UploadTooLarge(f"{name} is {size} bytes, limit is {MAX_UPLOAD_BYTES} bytes")
+        
+        if self._zip is not None:
+            # Zip members are not seekable on older Pythons; read the one image
+            return io.BytesIO(self._zip.read(member))
+        return self._tar.extractfile(member)
+    
+    def close(self):
+        """Close the underlying archive"""
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+
+
+def to_grayscale(image):
+    """
+    Convert a decoded image to 8-bit grayscale ('L')
+    
+    16-bit and float radiographs are window-levelled to their own min/max
+    range; a plain convert('L') would clip everything above 255.
+    
+    Args:
+        image: PIL Image
+    
+    Returns:
+        PIL Image in mode 'L'
+    """
+    if image.mode not in HIGH_BIT_DEPTH_MODES:
+        return image.convert("L")
+    
+    pixels = np.asarray(image, dtype=np.float32)
+    low, high = float(pixels.min()), float(pixels.max())
+    scale = 255.0 / (high - low) if high > low else 0.0
+    return Image.fromarray(((pixels - low) * scale).astype(np.uint8), mode="L")
+
+
+def decode_radiograph(fileobj, max_side=STORED_MAX_SIDE, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Decode an upload into a grayscale image, downsampling as early as possible
+    
+    The header is checked against max_pixels before any pixel data is read.
+    JPEGs are decoded directly at reduced scale with PIL draft mode (DCT
+    scaling); other formats are reduced right after decoding, before the
+    8-bit conversion, so full-resolution intermediates are short-lived.
+    
+    Args:
+        fileobj: Seekable file object or path
+        max_side: Longest side of the result (0 keeps full resolution)
+        max_pixels: Largest accepted width x height
+    
+    Returns:
+        PIL Image in mode 'L'
+    """
+    image = Image.open(fileobj)
+    width, height = image.size
+    if width * height > max_pixels:
+        raise UploadTooLarge(f"Image is {width}x{height}, limit is {max_pixels} pixels")
+    
+    if max_side and max(width, height) > max_side:
+        scale = max_side / max(width, height)
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        
+        # No-op for formats without reduced decoding
+        image.draft("L", target)
+        
+        if image.mode in ("I;16", "I;16B", "I;16L", "I;16N"):
+            # Resampling is supported for 32-bit integer images
+            image = image.convert("I")
+        image.thumbnail(target, Image.BILINEAR)
+    
+    return to_grayscale(image)
@@ -0,0 +1,176 @@
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+# Set to 0 to stop recording stage histograms (debug timings still work)
+METRICS_ENABLED = os.environ.get("BONEAGE_METRICS", "1") != "0"
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Per-request stage timings, only set while a debug trace is active
+_trace = contextvars.ContextVar("boneage_stage_trace", default=None)
+
+# Set while serving requests; stages timed outside (warm-up, auto-tune,
+# offline rescoring) stay out of the histograms
+_recording = contextvars.ContextVar("boneage_record_metrics", default=False)
+
+
+class Histogram:
+    """Cumulative latency histogram per label value, in Prometheus layout"""
+    
+    def __init__(self, name, help_text, label, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            name: Metric name
+            help_text: HELP line
+            label: Label name distinguishing the series (e.g. 'stage')
+            buckets: Bucket upper bounds in seconds
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, label_value, seconds):
+        """Record one observation"""
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {
+                    "buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0
+                }
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+    
+    def render(self):
+        """Prometheus text exposition lines"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                label = f'{self.label}="{label_value}"'
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label}}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{{label}}} {series["count"]}')
+        return lines
+
+
+STAGE_LATENCY = Histogram(
+    "boneage_stage_duration_seconds",
+    "Time spent in each /predict pipeline stage",
+    "stage"
+)
+REQUEST_LATENCY = Histogram(
+    "boneage_request_duration_seconds",
+    "End-to-end HTTP request latency by route",
+    "route"
+)
+
+
+@contextlib.contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if METRICS_ENABLED and _recording.get():
+            STAGE_LATENCY.observe(name, elapsed)
+        trace = _trace.get()
+        if trace is not None:
+            trace[name] = trace.get(name, 0.0) + elapsed
+
+
+_NOT_TIMED = contextlib.nullcontext()
+
+
+def stage(name):
+    """
+    Time a pipeline stage
+    
+    Usage: `with stage("preprocess"): ...`. Outside request handling (see
+    record_request_metrics) or with metrics disabled, and with no debug trace
+    active, this returns a shared no-op context manager. Repeated stages
+    within one trace are summed.
+    """
+    if not (METRICS_ENABLED and _recording.get()) and _trace.get() is None:
+        return _NOT_TIMED
+    return _timed_stage(name)
+
+
+def observe(name, seconds):
+    """Record a stage duration measured elsewhere"""
+    if METRICS_ENABLED and _recording.get():
+        STAGE_LATENCY.observe(name, seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace[name] = trace.get(name, 0.0) + seconds
+
+
+def add_to_trace(timings):
+    """
+    Merge timings recorded in another context (e.g. a shared batch forward)
+    into the current trace; histograms already have them
+    """
+    trace = _trace.get()
+    if trace is not None:
+        for name, seconds in timings.items():
+            trace[name] = trace.get(name, 0.0) + seconds
+
+
+def record_request_metrics():
+    """
+    Record stage histograms for work started from the current context
+    
+    Called by the HTTP middleware and the batch scheduler loop; pipeline
+    worker calls inherit it through the copied context.
+    """
+    _recording.set(True)
+
+
+def current_trace():
+    """The active debug trace, or None"""
+    return _trace.get()
+
+
+def start_trace():
+    """
+    Collect stage timings for the current request (and the pipeline worker
+    calls it makes, which run in a copy of its context)
+    
+    Returns:
+        dict: stage name -> seconds, filled in as stages complete
+    """
+    trace = {}
+    _trace.set(trace)
+    return trace
+
+
+def format_trace(trace):
+    """Stage timings in milliseconds for a JSON response"""
+    return {name: round(seconds * 1000.0, 3) for name, seconds in trace.items()}
+
+
+def render_metrics(gauges=None):
+    """
+    Prometheus text exposition of all histograms plus point-in-time gauges
+    
+    Args:
+        gauges: dict of metric name -> (help text, value)
+    
+    Returns:
+        str: text/plain; version=0.0.4 body
+    """
+    lines = STAGE_LATENCY.render() + REQUEST_LATENCY.render()
+    for name, (help_text, value) in (gauges or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+# Directory of model versions: <registry>/<version>/male_boneage_model.pth
+MODEL_REGISTRY_DIR = os.environ.get("BONEAGE_MODEL_REGISTRY", "models")
+
+# Checkpoints served when no registry version has been activated
+DEFAULT_MALE_MODEL = "male_boneage_model.pth"
+DEFAULT_FEMALE_MODEL = "female_boneage_model.pth"
+
+# File inside the registry recording the active version across restarts
+ACTIVE_FILE = "ACTIVE"
+
+
+class ModelRegistry:
+    """
+    Local directory registry of model versions with background hot-swap
+    
+    Each version is a subdirectory holding male_boneage_model.pth and
+    optionally female_boneage_model.pth. Activating a version loads and
+    warms it on a worker thread while the current model keeps serving, then
+    swaps it in with set_inference_model. The active version is written to
+    <registry>/ACTIVE so a restart comes back on the same model.
+    """
+    
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        """
+        Args:
+            root: Registry directory
+        """
+        self.root = root
+        self._lock = threading.Lock()
+        
+        # Background load state, reported by GET /admin/models
+        self.loading_version = None
+        self.last_swap = None
+        self.last_error = None
+    
+    def version_paths(self, version):
+        """
+        Checkpoint paths of a registered version
+        
+        Raises:
+            KeyError: If the version does not exist
+        """
+        version_dir = os.path.join(self.root, version)
+        male_model_path = os.path.join(version_dir, DEFAULT_MALE_MODEL)
+        if os.path.basename(os.path.normpath(version)) != version or not os.path.exists(male_model_path):
+            raise KeyError(f"Model version '{version}' not found in {self.root}")
+        
+        female_model_path = os.path.join(version_dir, DEFAULT_FEMALE_MODEL)
+        return male_model_path, female_model_path if os.path.exists(female_model_path) else None
+    
+    def list_versions(self):
+        """Registered versions, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        
+        versions = []
+        for name in os.listdir(self.root):
+            try:
+                male_model_path, female_model_path = self.version_paths(name)
+            except KeyError:
+                continue
+            versions.append({
+                "version": name,
+                "male_model_path": male_model_path,
+                "female_model_path": female_model_path,
+                "created": datetime.fromtimestamp(os.path.getmtime(male_model_path)).isoformat()
+            })
+        return sorted(versions, key=lambda version: version["created"])
+    
+    def active_version(self):
+        """Version recorded in the ACTIVE file, or None"""
+        active_file = os.path.join(self.root, ACTIVE_FILE)
+        if not os.path.exists(active_file):
+            return None
+        with open(active_file) as f:
+            return f.read().strip() or None
+    
+    def active_paths(self):
+        """
+        Checkpoints to serve at startup
+        
+        Returns:
+            tuple: (version or None, male model path, female model path)
+        """
+        version = self.active_version()
+        if version:
+            try:
+                return (version,) + self.version_paths(version)
+            except KeyError:
+                print(f"⚠ Active model version '{version}' is missing, using default checkpoints")
+        return None, DEFAULT_MALE_MODEL, DEFAULT_FEMALE_MODEL
+    
+    def activate(self, version, warmup=True):
+        """
+        Load, warm up and swap in a version (blocking; run on a worker thread)
+        
+        Args:
+            version: Registered version name
+            warmup: Run warm-up forwards before the swap
+        
+        Returns:
+            dict: Swap summary
+        """
+        from utils.inference import ModelInference, set_inference_model
+        
+        male_model_path, female_model_path = self.version_paths(version)
+        with self._lock:
+            if self.loading_version is not None:
+                raise RuntimeError(f"Version '{self.loading_version}' is already loading")
+            self.loading_version = version
+            self.last_error = None
+        
+        try:
+            start = time.perf_counter()
+            inference_model = ModelInference(male_model_path, female_model_path, version=version)
+            warmup_s = inference_model.warmup() if warmup else 0.0
+            
+            previous = set_inference_model(inference_model)
+            self._write_active(version)
+            
+            self.last_swap = {
+                "version": version,
+                "model_version": inference_model.model_version,
+                "previous_model_version": previous.model_version if previous else None,
+                "load_s": round(time.perf_counter() - start - warmup_s, 3),
+                "warmup_s": round(warmup_s, 3),
+                "timestamp": datetime.now().isoformat()
+            }
+            print(f"✅ Swapped in model version {inference_model.model_version}")
+            return self.last_swap
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            print(f"✗ Failed to activate model version {version}: {e}")
+            raise
+        finally:
+            with self._lock:
+                self.loading_version = None
+    
+    def _write_active(self, version):
+        """Record the active version atomically"""
+        os.makedirs(self.root, exist_ok=True)
+        active_file = os.path.join(self.root, ACTIVE_FILE)
+        tmp_path = active_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, active_file)
+    
+    def get_status(self):
+        """Registry state for the admin endpoint"""
+        return {
+            "registry": self.root,
+            "active_version": self.active_version(),
+            "loading_version": self.loading_version,
+            "last_swap": self.last_swap,
+            "last_error": self.last_error
+        }
+
+
+# Global registry instance
+_registry_instance = None
+
+
+def get_model_registry():
+    """Get or create global model registry"""
+    global _registry_instance
+    if _registry_instance is None:
+        _registry_instance = ModelRegistry()
+    return _registry_instance
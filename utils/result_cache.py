@@ -0,0 +1,189 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from database.db import SessionLocal
+from database.models import CachedResult
+
+# Set to 0 to disable the content-addressed result cache
+RESULT_CACHE_ENABLED = os.environ.get("BONEAGE_RESULT_CACHE", "1") != "0"
+
+# Entries kept in the in-memory LRU
+CACHE_MEMORY_ENTRIES = int(os.environ.get("BONEAGE_CACHE_MEMORY_ENTRIES", "1024"))
+
+# Rows kept in the SQLite result_cache table (least recently hit are evicted)
+CACHE_MAX_ROWS = int(os.environ.get("BONEAGE_CACHE_MAX_ROWS", "10000"))
+
+# Result fields stored per cache entry
+CACHE_FIELDS = (
+    "male_age", "male_uncertainty", "male_gradcam_path",
+    "female_age", "female_uncertainty", "female_gradcam_path"
+)
+
+
+def content_key(pil_image, model_version):
+    """
+    Content address of an upload for a given model version
+    
+    The key hashes the decoded pixel data (not the file bytes), so the same
+    X-ray re-encoded or re-uploaded under another name maps to one entry.
+    
+    Args:
+        pil_image: Decoded PIL Image
+        model_version: ModelInference.served_version() of the forward that ran
+    
+    Returns:
+        str: SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(model_version.encode())
+    digest.update(f"{pil_image.mode}:{pil_image.size[0]}x{pil_image.size[1]}".encode())
+    digest.update(pil_image.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-level cache of prediction results keyed by content_key
+    
+    An in-memory LRU sits in front of the SQLite result_cache table, so hits
+    survive restarts and are shared by all workers using the same database.
+    Both levels are size-bounded; the table evicts the least recently hit
+    rows. Methods block on SQLite and should run on the pipeline executor.
+    """
+    
+    def __init__(self, max_memory_entries=CACHE_MEMORY_ENTRIES, max_rows=CACHE_MAX_ROWS,
+                 session_factory=SessionLocal):
+        """
+        Args:
+            max_memory_entries: Entries kept in the in-memory LRU
+            max_rows: Rows kept in the result_cache table
+            session_factory: SQLAlchemy session factory
+        """
+        self.max_memory_entries = max(1, max_memory_entries)
+        self.max_rows = max(1, max_rows)
+        self.session_factory = session_factory
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """
+        Look up a cached result
+        
+        Args:
+            key: content_key of the upload
+        
+        Returns:
+            dict: Cached result fields, or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return dict(entry)
+        
+        db = self.session_factory()
+        try:
+            row = db.query(CachedResult).filter(CachedResult.cache_key == key).first()
+            if row is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            
+            row.hit_count = (row.hit_count or 0) + 1
+            row.last_hit_timestamp = datetime.utcnow()
+            db.commit()
+            
+            entry = {field: getattr(row, field) for field in CACHE_FIELDS}
+            with self._lock:
+                self.hits += 1
+                self._remember(key, entry)
+            return dict(entry)
+        finally:
+            db.close()
+    
+    def put(self, key, entry):
+        """
+        Store a result, evicting the least recently used entries if needed
+        
+        Args:
+            key: content_key of the upload
+            entry: dict with the CACHE_FIELDS values
+        """
+        entry = {field: entry.get(field) for field in CACHE_FIELDS}
+        with self._lock:
+            self._remember(key, entry)
+        
+        db = self.session_factory()
+        try:
+            row = db.query(CachedResult).filter(CachedResult.cache_key == key).first()
+            if row is None:
+                row = CachedResult(cache_key=key)
+                db.add(row)
+            for field, value in entry.items():
+                setattr(row, field, value)
+            row.last_hit_timestamp = datetime.utcnow()
+            db.commit()
+            
+            self._evict_rows(db)
+        finally:
+            db.close()
+    
+    def _remember(self, key, entry):
+        """Insert into the in-memory LRU (caller holds the lock)"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+    
+    def _evict_rows(self, db):
+        """Delete the least recently hit rows beyond max_rows"""
+        excess = db.query(CachedResult).count() - self.max_rows
+        if excess <= 0:
+            return
+        
+        stale_ids = [
+            row_id for row_id, in db.query(CachedResult.id)
+            .order_by(CachedResult.last_hit_timestamp.asc())
+            .limit(excess)
+        ]
+        db.query(CachedResult).filter(CachedResult.id.in_(stale_ids)).delete(synchronize_session=False)
+        db.commit()
+        with self._lock:
+            self.evictions += len(stale_ids)
+    
+    def get_stats(self):
+        """Get cache metrics"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": RESULT_CACHE_ENABLED,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "evictions": self.evictions
+        }
+
+
+# Global result cache instance
+_cache_instance = None
+
+
+def get_result_cache():
+    """Get or create global result cache"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = ResultCache()
+    return _cache_instance
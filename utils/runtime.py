@@ -0,0 +1,148 @@
+import os
+import time
+
+import torch
+
+from utils.concurrency import EXECUTOR_WORKERS
+
+# uvicorn worker processes per node; the CPU budget is split between them
+WORKERS = int(os.environ.get("BONEAGE_WORKERS", "1"))
+
+# Intra-op threads per process: an integer, 'auto' to probe at startup, or
+# unset for cpu_count // BONEAGE_WORKERS
+TORCH_THREADS = os.environ.get("BONEAGE_TORCH_THREADS", "")
+
+# Inter-op threads per process (only settable before the first parallel op)
+INTEROP_THREADS = int(os.environ.get("BONEAGE_INTEROP_THREADS", "1"))
+
+# Timed forwards per candidate thread count in auto-tune mode
+AUTOTUNE_REPEATS = int(os.environ.get("BONEAGE_AUTOTUNE_REPEATS", "3"))
+
+# Batch size of the auto-tune probe forwards (kept small to bound startup time)
+AUTOTUNE_BATCH_SIZE = int(os.environ.get("BONEAGE_AUTOTUNE_BATCH_SIZE", "1"))
+
+
+class RuntimeSettings:
+    """
+    Process-wide torch threading configuration
+    
+    Each uvicorn worker is a separate process with its own torch thread
+    pools, so by default every worker gets cpu_count // workers intra-op
+    threads instead of all cores. The server applies the settings once at
+    startup, before the first model is loaded; offline scripts that build a
+    ModelInference keep their own thread settings. In auto-tune mode a few intra-op thread
+    counts within that budget are timed with warm-up forwards and the
+    fastest one is kept.
+    """
+    
+    def __init__(self, workers=WORKERS, torch_threads=TORCH_THREADS,
+                 interop_threads=INTEROP_THREADS, executor_workers=EXECUTOR_WORKERS):
+        """
+        Args:
+            workers: Worker processes sharing this host's cores
+            torch_threads: Intra-op threads, 'auto', or '' for the per-worker budget
+            interop_threads: Inter-op threads
+            executor_workers: Pipeline executor size (BONEAGE_EXECUTOR_WORKERS)
+        """
+        self.workers = max(1, workers)
+        self.cpu_count = os.cpu_count() or 1
+        self.thread_budget = max(1, self.cpu_count // self.workers)
+        
+        torch_threads = str(torch_threads).strip().lower()
+        self.auto_tune = torch_threads == "auto"
+        self.intra_op_threads = int(torch_threads) if torch_threads.isdigit() else self.thread_budget
+        self.interop_threads = max(1, interop_threads)
+        self.executor_workers = executor_workers
+        
+        self.applied = False
+        self.autotune_results = None
+    
+    def apply(self):
+        """Set torch's thread pools (no-op after the first call)"""
+        if self.applied:
+            return
+        self.applied = True
+        
+        torch.set_num_threads(self.intra_op_threads)
+        try:
+            torch.set_num_interop_threads(self.interop_threads)
+        except RuntimeError as e:
+            # Fails once any inter-op work has started in this process
+            print(f"⚠ Could not set inter-op threads: {e}")
+        print(f"🧵 Torch threads: {torch.get_num_threads()} intra-op, "
+              f"{torch.get_num_interop_threads()} inter-op ({self.workers} worker(s), {self.cpu_count} CPUs)")
+    
+    def candidates(self):
+        """Intra-op thread counts tried by auto-tune: powers of two up to the budget, plus the budget"""
+        counts = {self.thread_budget}
+        threads = 1
+        while threads < self.thread_budget:
+            counts.add(threads)
+            threads *= 2
+        return sorted(counts)
+    
+    def autotune(self, inference_model, batch_size=AUTOTUNE_BATCH_SIZE, repeats=AUTOTUNE_REPEATS):
+        """
+        Time warm-up forwards at each candidate thread count and keep the fastest
+        
+        Runs once per process tree: serve.py tunes in the parent before
+        forking, and workers inherit the result (see `tuned`).
+        
+        Args:
+            inference_model: ModelInference to probe
+            batch_size: Batch size of the probe forwards
+            repeats: Timed forwards per candidate
+        
+        Returns:
+            int: Chosen intra-op thread count
+        """
+        self.apply()
+        batch = torch.zeros(batch_size, 1, 224, 224, device=inference_model.device)
+        results = {}
+        
+        for threads in self.candidates():
+            torch.set_num_threads(threads)
+            inference_model.infer_batch(batch)  # untimed: pool spin-up
+            start = time.perf_counter()
+            for _ in range(repeats):
+                inference_model.infer_batch(batch)
+            results[threads] = (time.perf_counter() - start) / repeats
+        
+        self.intra_op_threads = min(results, key=results.get)
+        torch.set_num_threads(self.intra_op_threads)
+        self.autotune_results = {
+            "batch_size": batch_size,
+            "forward_ms": {str(threads): round(seconds * 1000, 2) for threads, seconds in results.items()},
+            "chosen": self.intra_op_threads
+        }
+        print(f"🎛️  Auto-tune picked {self.intra_op_threads} intra-op threads "
+              f"({results[self.intra_op_threads] * 1000:.1f} ms per batch of {batch_size})")
+        return self.intra_op_threads
+    
+    @property
+    def tuned(self):
+        """True once autotune() has picked a thread count"""
+        return self.autotune_results is not None
+    
+    def get_stats(self):
+        """Effective settings for the health endpoint"""
+        return {
+            "workers": self.workers,
+            "cpu_count": self.cpu_count,
+            "intra_op_threads": torch.get_num_threads(),
+            "interop_threads": torch.get_num_interop_threads(),
+            "executor_workers": self.executor_workers,
+            "auto_tune": self.autotune_results if self.auto_tune else False
+        }
+
+
+# Global settings instance
+_settings_instance = None
+
+
+def get_runtime_settings():
+    """Get or create global runtime settings"""
+    global _settings_instance
+    if _settings_instance is None:
+        _settings_instance = RuntimeSettings()
+    return _settings_instance
@@ -0,0 +1,213 @@
+import os
+import threading
+
+import numpy as np
+import torch
+
+from database.db import SessionLocal
+from database.models import StoredTensor
+from utils.augmentation import eval_transform
+
+# Set to 0 to stop recording preprocessed inputs
+TENSOR_STORE_ENABLED = os.environ.get("BONEAGE_TENSOR_STORE", "1") != "0"
+
+# Append-only file of uint8 224x224 records
+TENSOR_STORE_PATH = os.environ.get("BONEAGE_TENSOR_STORE_PATH", "storage/tensors.u8")
+
+INPUT_SIZE = 224
+RECORD_BYTES = INPUT_SIZE * INPUT_SIZE
+
+# eval_transform's Resize step; its uint8 output is what ToTensor/Normalize consume
+_resize = eval_transform.transforms[0]
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+
+def to_record(pil_image):
+    """Resize a grayscale PIL image to the uint8 bytes of one store record"""
+    pixels = np.asarray(_resize(pil_image.convert("L")), dtype=np.uint8)
+    return pixels.tobytes()
+
+
+def normalize_records(pixels):
+    """
+    Turn uint8 records into model input, exactly as eval_transform would
+    
+    Args:
+        pixels: uint8 array [N, 224, 224]
+    
+    Returns:
+        torch.Tensor: [N, 1, 224, 224] float32 in [-1, 1]
+    """
+    # astype is the single copy out of the memory map
+    return torch.from_numpy(pixels.astype(np.float32)).div_(255).sub_(0.5).div_(0.5).unsqueeze(1)
+
+
+class TensorStore:
+    """
+    Append-only store of preprocessed model inputs
+    
+    Each upload's resized 224x224 input is appended to one flat uint8 file
+    and indexed in the tensor_store table by patient and prediction. Reads
+    memory-map the file, so re-scoring or re-running Grad-CAM over the
+    archive skips PNG decoding and resizing entirely. uint8 is lossless
+    here: Resize outputs 8-bit pixels before ToTensor/Normalize.
+    """
+    
+    def __init__(self, path=TENSOR_STORE_PATH, session_factory=SessionLocal):
+        """
+        Args:
+            path: Store file path
+            session_factory: SQLAlchemy session factory
+        """
+        self.path = path
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._map = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        
+        # Metrics
+        self.appended = 0
+    
+    def append(self, pil_image, patient_id, prediction_id=None, db=None):
+        """
+        Append one image and index it
+        
+        Args:
+            pil_image: Decoded grayscale PIL Image
+            patient_id: Patient database ID
+            prediction_id: Prediction database ID (optional)
+            db: Session of an open transaction to add the index row to (it
+                is committed with that transaction); by default the row is
+                committed in a session of its own
+        
+        Returns:
+            int: Record number
+        """
+        record = self.append_record(to_record(pil_image))
+        
+        if db is not None:
+            self.index(db, record, patient_id, prediction_id)
+            return record
+        
+        db = self.session_factory()
+        try:
+            self.index(db, record, patient_id, prediction_id)
+            db.commit()
+        finally:
+            db.close()
+        return record
+    
+    def index(self, db, record, patient_id, prediction_id=None):
+        """Add the index row of an appended record to a session (not committed)"""
+        db.add(StoredTensor(patient_id=patient_id, prediction_id=prediction_id, record=record))
+    
+    def append_record(self, data):
+        """
+        Append raw record bytes to the file
+        
+        The end offset is taken under a thread lock and (where available) an
+        exclusive flock, so concurrent workers and processes never interleave
+        or mis-number records.
+        
+        Returns:
+            int: Record number
+        """
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                offset = os.lseek(fd, 0, os.SEEK_END)
+                if offset % RECORD_BYTES:
+                    # A torn write from a crash: pad it out so numbering stays aligned
+                    os.write(fd, bytes(RECORD_BYTES - offset % RECORD_BYTES))
+                    offset += RECORD_BYTES - offset % RECORD_BYTES
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            self.appended += 1
+        return offset // RECORD_BYTES
+    
+    def _records(self):
+        """Memory map of all complete records, remapped when the file has grown"""
+        count = os.path.getsize(self.path) // RECORD_BYTES if os.path.exists(self.path) else 0
+        with self._lock:
+            if self._map is None or self._map.shape[0] < count:
+                self._map = np.memmap(
+                    self.path, dtype=np.uint8, mode="r", shape=(count, INPUT_SIZE, INPUT_SIZE)
+                ) if count else np.empty((0, INPUT_SIZE, INPUT_SIZE), dtype=np.uint8)
+            return self._map
+    
+    def read(self, records):
+        """
+        Read uint8 records
+        
+        A contiguous run of records is returned as a view of the memory map
+        (no copy); otherwise the records are gathered.
+        
+        Args:
+            records: Sequence of record numbers
+        
+        Returns:
+            numpy array [N, 224, 224] uint8
+        """
+        records = np.asarray(records, dtype=np.int64)
+        store = self._records()
+        if len(records) and records.max() >= store.shape[0]:
+            raise IndexError(f"record {int(records.max())} is beyond the end of {self.path}")
+        if len(records) and np.array_equal(records, np.arange(records[0], records[0] + len(records))):
+            return store[records[0]:records[0] + len(records)]
+        return store[records]
+    
+    def load_batch(self, records, device='cpu'):
+        """
+        Load records as a normalized model input batch
+        
+        Returns:
+            torch.Tensor: [N, 1, 224, 224] on device
+        """
+        return normalize_records(self.read(records)).to(device)
+    
+    def latest_records(self, db, patient_ids):
+        """
+        Latest record per patient
+        
+        Args:
+            db: SQLAlchemy session
+            patient_ids: Patient database IDs
+        
+        Returns:
+            dict: patient ID -> record number (patients without one are absent)
+        """
+        rows = (
+            db.query(StoredTensor.patient_id, StoredTensor.record)
+            .filter(StoredTensor.patient_id.in_(list(patient_ids)))
+            .order_by(StoredTensor.id.asc())
+        )
+        return {patient_id: record for patient_id, record in rows}
+    
+    def get_stats(self):
+        """Get store metrics"""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {
+            "enabled": TENSOR_STORE_ENABLED,
+            "records": size // RECORD_BYTES,
+            "size_mb": round(size / (1024 * 1024), 2),
+            "appended": self.appended
+        }
+
+
+# Global tensor store instance
+_store_instance = None
+
+
+def get_tensor_store():
+    """Get or create global tensor store"""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = TensorStore()
+    return _store_instance